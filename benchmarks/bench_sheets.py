@@ -0,0 +1,139 @@
+"""
+Micro-benchmark da camada de armazenamento (utils.sheets) sobre a planilha falsa em
+memória (utils.fake_sheets): tempo de parede e chamadas de API de read_df, write_df,
+upsert_row e delete_row com 10, 1k e 10k linhas.
+
+    python benchmarks/bench_sheets.py
+    python benchmarks/bench_sheets.py --sizes 10,1000 --latency 0.05 --repeat 5 --json out.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from utils import sheets  # noqa: E402
+from utils.fake_sheets import FakeClient  # noqa: E402
+from utils.schemas import get_schema  # noqa: E402
+
+TAB = "news"
+SIZES = [10, 1_000, 10_000]
+
+def seed_rows(n: int) -> List[List[str]]:
+    return [[str(i), f"Notícia {i}", f"Descrição da notícia {i}", f"https://img.example/{i}.jpg",
+             "TRUE" if i % 3 else "FALSE", str(i)] for i in range(1, n + 1)]
+
+def measure(client: FakeClient, fn: Callable[[], None]) -> Dict:
+    client.reset_calls()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        fn()
+    except Exception as e:  # erros de cota simulados contam no resultado, não param a rodada
+        error = type(e).__name__
+    return {"ms": (time.perf_counter() - t0) * 1000, "calls": client.total_calls(),
+            "by_op": dict(client.calls), "error": error}
+
+def scenarios(n: int) -> Dict[str, Callable[[], None]]:
+    headers = get_schema(TAB).headers
+
+    def read_cold():
+        sheets.invalidate_cache(TAB)
+        sheets.read_df(TAB, headers)
+
+    def read_warm():
+        sheets.read_df(TAB, headers)
+
+    def write_one_cell():
+        df = sheets.read_df(TAB, headers)
+        df.loc[n // 2, "title"] = f"Editada {time.time()}"
+        sheets.write_df(TAB, headers, df)
+
+    def write_append():
+        df = sheets.read_df(TAB, headers)
+        new = get_schema(TAB).coerce(pd.DataFrame([{"id": str(len(df) + 1), "title": "Nova",
+                                                    "is_active": "TRUE", "order": str(len(df) + 1)}]))
+        sheets.write_df(TAB, headers, pd.concat([df, new], ignore_index=True))
+
+    def upsert_update():
+        sheets.upsert_row(TAB, headers, {"id": str(max(1, n // 2)), "title": f"Upsert {time.time()}"})
+
+    def upsert_insert():
+        sheets.upsert_row(TAB, headers, {"title": "Inserida", "is_active": "TRUE", "order": str(n + 1)})
+
+    def delete():
+        # apaga a última linha inserida (cada repetição apaga uma diferente)
+        last = sheets.read_index(TAB, ["id"])["id"].max()
+        sheets.delete_row(TAB, headers, int(last))
+
+    return {
+        "read_df (frio)": read_cold,
+        "read_df (snapshot)": read_warm,
+        "write_df (1 célula)": write_one_cell,
+        "write_df (+1 linha)": write_append,
+        "upsert_row (update)": upsert_update,
+        "upsert_row (insert)": upsert_insert,
+        "delete_row": delete,
+    }
+
+def run(sizes: List[int], latency: float, quota_error_rate: float, repeat: int,
+        quota_per_min: float = 0) -> List[Dict]:
+    if quota_per_min:
+        sheets.SHEETS_QUOTA_PER_MIN = quota_per_min
+    else:
+        # mede a camada de armazenamento, não a espera do governador de cota
+        sheets.SHEETS_QUOTA_PER_MIN = sheets.SHEETS_BURST = 10**9
+    results = []
+    for n in sizes:
+        client = FakeClient(latency=latency, quota_error_rate=quota_error_rate, seed=n)
+        sheets.install_client(client)
+        client.open_by_key("offline").seed(TAB, [get_schema(TAB).headers] + seed_rows(n))
+        sheets.read_df(TAB)  # valida cabeçalho e aquece o snapshot fora da medição
+        for name, fn in scenarios(n).items():
+            runs = [measure(client, fn) for _ in range(repeat)]
+            ok = [r for r in runs if not r["error"]] or runs
+            results.append({
+                "rows": n,
+                "op": name,
+                "ms_median": statistics.median(r["ms"] for r in ok),
+                "ms_max": max(r["ms"] for r in ok),
+                "api_calls": statistics.median(r["calls"] for r in ok),
+                "by_op": ok[-1]["by_op"],
+                "errors": sum(1 for r in runs if r["error"]),
+            })
+    sheets.install_client(None)
+    return results
+
+def print_table(results: List[Dict]):
+    print(f"{'linhas':>7}  {'operação':<22} {'mediana ms':>11} {'máx ms':>9} {'chamadas':>9} {'erros':>6}  detalhe")
+    for r in results:
+        detail = ", ".join(f"{k}={v}" for k, v in sorted(r["by_op"].items()))
+        print(f"{r['rows']:>7}  {r['op']:<22} {r['ms_median']:>11.1f} {r['ms_max']:>9.1f} "
+              f"{r['api_calls']:>9g} {r['errors']:>6}  {detail}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)), help="tamanhos da aba, separados por vírgula")
+    ap.add_argument("--latency", type=float, default=0.0, help="latência simulada por chamada de API (s)")
+    ap.add_argument("--quota-error-rate", type=float, default=0.0, help="probabilidade de 429 por chamada")
+    ap.add_argument("--quota-per-min", type=float, default=0,
+                    help="cota do governador (0 = sem limite; 60 = cota padrão do Sheets)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", help="grava os resultados também neste arquivo")
+    args = ap.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(",") if s.strip()],
+                  args.latency, args.quota_error_rate, args.repeat, args.quota_per_min)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
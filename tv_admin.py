@@ -1,9 +1,20 @@
 import streamlit as st
 import pandas as pd
-from utils.auth import login_ui, ensure_admin_bootstrap_ui
-from utils.sheets import read_df, write_df
+import time
+import json
+from streamlit_autorefresh import st_autorefresh
+from utils import metrics
+from utils.auth import login_ui, ensure_admin_bootstrap_ui, save_users_df
+from utils.sheets import (read_df, read_index, read_rows, write_rows, enqueue_write, write_status,
+                          use_lane, storage_revision)
+from utils.storage import ROW_COL
+from utils.schemas import get_schema, invalid_cells
+from utils.media import annotate_videos
+from utils.importer import IMPORT_RULES, import_file
 
 st.set_page_config(page_title="Admin – TV Corporativa", layout="wide")
+metrics.set_label("admin")
+use_lane("admin")  # leituras do admin passam na frente das TVs no governador de cota
 
 ensure_admin_bootstrap_ui()
 user = login_ui()
@@ -12,11 +23,6 @@ if not user:
 
 st.sidebar.success(f"Logado: {user.display_name} ({user.role})")
 
-def bool_cols(df: pd.DataFrame, cols):
-    for c in cols:
-        df[c] = df[c].astype(str).str.upper().isin(["TRUE","1","YES","SIM","Y"])
-    return df
-
 tabs = []
 keys = []
 if user.can("can_news"):        tabs.append("Notícias");         keys.append("news")
@@ -26,76 +32,272 @@ if user.can("can_weather"):     tabs.append("Tempo");            keys.append("we
 if user.can("can_clocks"):      tabs.append("Relógios");         keys.append("clocks")
 if user.can("can_rates"):       tabs.append("Config / Cotações");keys.append("settings")
 if user.can("can_users"):       tabs.append("Usuários");         keys.append("users")
+if user.role == "admin":        tabs.append("Diagnóstico");      keys.append("diagnostics")
+
+# colunas calculadas ao salvar (não editáveis)
+DERIVED = {"videos": ["kind", "embed_id"]}
+
+# abas grandes editadas por página: aba -> colunas da busca por texto
+PAGED = {"news": ["title", "description"], "birthdays": ["name"]}
+PAGE_SIZE = 50
+
+def editor_key(key: str) -> str:
+    """Chave do data_editor da aba; muda a cada gravação para o editor recomeçar dos dados salvos."""
+    return f"ed_{key}_{st.session_state.get(f'ed_ver_{key}', 0)}"
+
+def save(key: str, headers, df: pd.DataFrame):
+    """Enfileira a gravação (write-behind) e reinicia o editor da aba."""
+    if key == "videos":
+        # classifica cada vídeo uma vez aqui, para a TV renderizar sem I/O de rede
+        with st.spinner("Classificando vídeos…"):
+            df = annotate_videos(df)
+    enqueue_write(key, headers, df)
+    st.session_state[f"ed_ver_{key}"] = st.session_state.get(f"ed_ver_{key}", 0) + 1
+    st.session_state.pop(f"snap_{key}", None)
+    st.rerun()
+
+def import_ui(key: str):
+    """Importação em massa (CSV/XLSX) para o fim da aba, em lotes, com barra de progresso."""
+    report = st.session_state.pop(f"import_report_{key}", None)
+    with st.expander("Importar planilha (CSV/XLSX)", expanded=report is not None):
+        if report is not None:
+            st.success(f"{report['imported']} de {report['read']} linhas importadas; "
+                       f"{report['duplicates']} duplicadas e {report['invalid']} inválidas ignoradas.")
+            if report["errors"]:
+                st.warning("Linhas recusadas:\n\n" + "\n".join(f"- {e}" for e in report["errors"]))
+        st.caption("A primeira linha deve ter os nomes das colunas (os da aba ou os usuais em "
+                   "português, ex.: nome, setor, dia, mês, data de nascimento, título, descrição). "
+                   "Linhas já existentes (mesmo id ou mesmo nome/título) são ignoradas.")
+        up = st.file_uploader("Arquivo", type=["csv", "xlsx"], key=f"import_{key}")
+        if up is None or not st.button("Importar", key=f"import_btn_{key}"):
+            return
+        bar = st.progress(0.0, text="Lendo arquivo…")
+        try:
+            report = import_file(key, up, up.name, lambda done, text: bar.progress(done, text=text))
+        except RuntimeError as e:
+            st.error(str(e))
+            return
+        # o editor acima foi desenhado antes da importação: recomeça dos dados novos
+        st.session_state[f"import_report_{key}"] = report
+        st.session_state[f"ed_ver_{key}"] = st.session_state.get(f"ed_ver_{key}", 0) + 1
+        st.session_state.pop(f"snap_{key}", None)
+        st.session_state.pop(f"idx_{key}", None)
+        st.rerun()
+
+def load_index(key: str, columns) -> pd.DataFrame:
+    """Índice da aba (colunas de filtro + _row) guardado na sessão por revisão, com o texto de busca."""
+    revision = storage_revision()
+    snap = st.session_state.get(f"idx_{key}")
+    if snap is not None and revision is not None and snap[0] == revision:
+        return snap[1]
+    idx = read_index(key, columns)
+    idx["_search"] = idx[PAGED[key]].astype(str).agg(" ".join, axis=1).str.casefold()
+    if not is_saving(key):
+        st.session_state[f"idx_{key}"] = (revision, idx)
+    return idx
+
+def page_rows(key: str, schema) -> list:
+    """Filtros (situação, setor, mês, busca) resolvidos no índice; retorna os _row da página."""
+    filters = [c for c in ("is_active", "sector", "month") if c in schema.headers]
+    idx = load_index(key, ["id"] + filters + PAGED[key])
+    c1, c2, c3, c4 = st.columns(4)
+    mask = pd.Series(True, index=idx.index)
+    status = c1.selectbox("Situação", ["Todos", "Ativos", "Inativos"], key=f"f_active_{key}")
+    if status != "Todos":
+        mask &= idx["is_active"] == (status == "Ativos")
+    if "sector" in idx.columns:
+        sectors = sorted({str(s) for s in idx["sector"].dropna() if str(s)})
+        sector = c2.selectbox("Setor", ["Todos"] + sectors, key=f"f_sector_{key}")
+        if sector != "Todos":
+            mask &= idx["sector"].astype(str) == sector
+    if "month" in idx.columns:
+        month = c3.selectbox("Mês", ["Todos"] + list(range(1, 13)), key=f"f_month_{key}")
+        if month != "Todos":
+            mask &= (idx["month"] == month).fillna(False)
+    query = c4.text_input("Buscar", key=f"f_text_{key}").strip().casefold()
+    if query:
+        mask &= idx["_search"].str.contains(query, regex=False)
+
+    found = idx[mask]
+    pages = max(1, -(-len(found) // PAGE_SIZE))
+    if st.session_state.get(f"page_{key}", 1) > pages:
+        st.session_state[f"page_{key}"] = pages  # filtro reduziu o número de páginas
+    page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, key=f"page_{key}")
+    st.caption(f"{len(found)} de {len(idx)} linhas")
+    return found[ROW_COL].iloc[(page - 1) * PAGE_SIZE:page * PAGE_SIZE].tolist()
+
+def save_page(key: str, headers, page: pd.DataFrame, edited: pd.DataFrame):
+    """Grava só as linhas da página que mudaram (sem passar pela fila da aba inteira)."""
+    try:
+        with st.spinner("Salvando…"):
+            n = write_rows(key, headers, page, edited)
+    except RuntimeError as e:
+        st.error(str(e))
+        return
+    st.session_state[f"page_saved_{key}"] = (n, time.time())
+    st.session_state[f"ed_ver_{key}"] = st.session_state.get(f"ed_ver_{key}", 0) + 1
+    st.session_state.pop(f"idx_{key}", None)
+    st.rerun()
+
+def new_row_form(key: str, headers):
+    """Formulário "Adicionar novo"; retorna a linha digitada quando o botão é clicado."""
+    with st.expander("Adicionar novo"):
+        new = {h: st.text_input(h, key=f"{key}_{h}") for h in headers if h not in DERIVED.get(key, [])}
+        if st.button("Adicionar", key=f"add_{key}"):
+            return new
+    return None
+
+def typed_new_row(schema, new: dict):
+    """Linha digitada já tipada; None (com o erro na tela) se algum número não converte."""
+    row = schema.coerce(pd.DataFrame([new]))
+    invalid = invalid_cells(row)
+    if invalid:
+        cells = "; ".join(f"{col} = '{text}'" for col, found in invalid.items() for text in found.values())
+        st.error(f"Valores que não são números válidos: {cells}. Corrija e adicione de novo.")
+        return None
+    return row
+
+def show_diagnostics():
+    """Métricas de todos os processos (display e admin) gravadas por utils.metrics."""
+    snaps = metrics.load_all()
+    st.caption("Latência, chamadas, erros e acertos de cache por ponto de chamada, "
+               f"atualizados a cada {metrics.METRICS_FLUSH_SEC}s por processo.")
+    st.download_button("Exportar JSON", json.dumps(snaps, ensure_ascii=False, indent=2),
+                       file_name=f"diagnostico-{time.strftime('%Y%m%d-%H%M%S')}.json",
+                       mime="application/json")
+    for snap in sorted(snaps, key=lambda s: (s["label"], s["pid"])):
+        updated = time.strftime('%H:%M:%S', time.localtime(snap["updated_at"]))
+        st.markdown(f"**{snap['label']}** (pid {snap['pid']}, atualizado às {updated})")
+        rows = metrics.summary_rows(snap)
+        if rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Sem chamadas registradas ainda.")
+        breakers = (snap.get("states") or {}).get("breakers") or {}
+        if breakers:
+            now = time.time()
+            st.dataframe(pd.DataFrame([
+                {"host": host, "falhas seguidas": b["failures"],
+                 "circuito": (f"aberto até {time.strftime('%H:%M:%S', time.localtime(b['open_until']))}"
+                              if b["open_until"] > now else "fechado")}
+                for host, b in sorted(breakers.items())
+            ]), use_container_width=True, hide_index=True)
+
+def is_saving(key: str) -> bool:
+    return (write_status(key) or {}).get("state") in ("pendente", "gravando")
+
+def load_tab(key: str) -> pd.DataFrame:
+    """
+    Dados da aba guardados na sessão: só são relidos depois que a aba salva ou quando a
+    revisão do armazenamento muda (edição na planilha por fora, outro admin).
+    """
+    revision = storage_revision()
+    snap = st.session_state.get(f"snap_{key}")
+    if snap is not None and revision is not None and snap[0] == revision:
+        return snap[1]
+    df = read_df(key)
+    if not is_saving(key):  # com gravação na fila, a revisão ainda vai mudar
+        st.session_state[f"snap_{key}"] = (revision, df)
+    return df
+
+def show_write_status(key: str):
+    saved = st.session_state.get(f"page_saved_{key}")
+    if saved:
+        st.caption(f"{saved[0]} linha(s) gravada(s) na planilha às "
+                   f"{time.strftime('%H:%M:%S', time.localtime(saved[1]))}.")
+    status = write_status(key)
+    if not status:
+        return
+    if status["state"] == "erro":
+        st.error(f"Falha ao salvar na planilha: {status['error']}")
+    elif status["state"] in ("pendente", "gravando"):
+        st.info("Salvando na planilha…")
+    else:
+        st.caption(f"Salvo na planilha às {time.strftime('%H:%M:%S', time.localtime(status['at']))}.")
+
+# enquanto houver gravação em andamento, atualiza a página para mostrar o resultado
+if any(is_saving(k) for k in keys):
+    st_autorefresh(interval=2000, key="write_status_tick")
+
+# Só a aba escolhida roda (e lê dados); as outras não custam nada a cada rerun.
+choice = st.radio("Aba", tabs, horizontal=True, key="admin_tab", label_visibility="collapsed")
+key = keys[tabs.index(choice)]
+
+if key == "diagnostics":
+    show_diagnostics()
+    st.stop()
+
+schema = get_schema(key)
+headers = schema.headers
+st.subheader(key.capitalize())
+show_write_status(key)
+# abas paginadas leem só o índice e a página; as demais, a aba inteira
+df = schema.editable(load_tab(key)) if key not in PAGED else None
+
+if key in PAGED:
+    rows = page_rows(key, schema)
+    page = read_rows(key, rows)
+    edited = st.data_editor(schema.editable(page), use_container_width=True, num_rows="dynamic",
+                            key=f"{editor_key(key)}_{hash(tuple(rows))}", column_config={ROW_COL: None})
+    if st.button("Salvar alterações", key=f"save_{key}"):
+        save_page(key, headers, page, edited)
+
+    new = new_row_form(key, headers)
+    row = typed_new_row(schema, new) if new is not None else None
+    if row is not None:
+        save_page(key, headers, page.iloc[0:0], row)
+
+    if key in IMPORT_RULES:
+        import_ui(key)
+
+elif key in ("videos","weather","clocks"):
+    edited = st.data_editor(df, use_container_width=True, num_rows="dynamic", key=editor_key(key),
+                            disabled=DERIVED.get(key, []))
+    if st.button("Salvar alterações", key=f"save_{key}"):
+        save(key, headers, edited)
+
+    new = new_row_form(key, headers)
+    if new is not None:
+        if "id" in headers and not str(new.get("id", "")).strip():
+            # gera próximo id baseado no atual
+            try:
+                current_ids = pd.to_numeric(edited.get("id", []), errors="coerce").fillna(0).astype(int)
+                new["id"] = str(int(current_ids.max()) + 1 if len(current_ids) else 1)
+            except Exception:
+                new["id"] = "1"
+        row = typed_new_row(schema, new)
+        if row is not None:
+            save(key, headers, pd.concat([edited, schema.editable(row)], ignore_index=True))
+
+elif key == "settings":
+    edited = st.data_editor(df, use_container_width=True, num_rows="dynamic", key=editor_key(key))
+    if st.button("Salvar configurações"):
+        save(key, headers, edited)
 
-selected = st.tabs(tabs)
-
-SCHEMAS = {
-    "news": ["id","title","description","image_url","is_active","order"],
-    "birthdays": ["id","name","sector","day","month","photo_url","is_active","order"],
-    "videos": ["id","title","url","duration_sec","is_active","order"],
-    "weather": ["id","label","lat","lon","is_active","order"],
-    "clocks": ["id","label","tz","is_active","order"],
-    "settings": ["key","value"],
-    "users": [
-        "username","display_name","password_hash","role",
-        "can_news","can_videos","can_birthdays","can_weather",
-        "can_rates","can_clocks","can_users","is_active"
-    ],
-}
-
-for tab, key in zip(selected, keys):
-    with tab:
-        headers = SCHEMAS[key]
-        df = read_df(key, headers)
-        st.subheader(key.capitalize())
-
-        if key in ("news","birthdays","videos","weather","clocks"):
-            df = bool_cols(df, ["is_active"]) if "is_active" in df.columns else df
-            if "order" in df.columns:
-                df["order"] = pd.to_numeric(df["order"], errors="coerce").fillna(0).astype(int)
-
-            edited = st.data_editor(df, use_container_width=True, num_rows="dynamic", key=f"ed_{key}")
-            if st.button("Salvar alterações", key=f"save_{key}"):
-                write_df(key, headers, edited)
-                st.success("Salvo.")
-
-            with st.expander("Adicionar novo"):
-                new = {h: st.text_input(h, key=f"{key}_{h}") for h in headers}
-                if st.button("Adicionar", key=f"add_{key}"):
-                    if key != "settings":
-                        if "id" in headers and not str(new.get("id", "")).strip():
-                            # gera próximo id baseado no atual
-                            try:
-                                current_ids = pd.to_numeric(edited.get("id", []), errors="coerce").fillna(0).astype(int)
-                                new["id"] = str(int(current_ids.max()) + 1 if len(current_ids) else 1)
-                            except Exception:
-                                new["id"] = "1"
-                    edited.loc[len(edited)] = [new.get(h, "") for h in headers]
-                    write_df(key, headers, edited)
-                    st.success("Adicionado.")
-
-        elif key == "settings":
-            edited = st.data_editor(df, use_container_width=True, num_rows="dynamic")
-            if st.button("Salvar configurações"):
-                write_df(key, headers, edited)
-                st.success("Configurações salvas.")
-
-        elif key == "users":
-            st.info("Para alterar senha, gere um novo hash bcrypt (abaixo) e cole em password_hash. Admin tem todas as permissões.")
-            edited = st.data_editor(df, use_container_width=True, num_rows="dynamic")
-            colh1, colh2 = st.columns([1,1])
-            with colh1:
-                if st.button("Salvar usuários"):
-                    write_df(key, headers, edited)
-                    st.success("Usuários salvos.")
-            with colh2:
-                import bcrypt
-                with st.form("hash_form"):
-                    plain = st.text_input("Gerar hash bcrypt para senha:", type="password")
-                    ok = st.form_submit_button("Gerar")
-                if ok:
-                    if not plain:
-                        st.error("Informe uma senha.")
-                    else:
-                        salt = bcrypt.gensalt()
-                        st.code(bcrypt.hashpw(plain.encode(), salt).decode())
+elif key == "users":
+    st.info("Para alterar senha, gere um novo hash bcrypt (abaixo) e cole em password_hash. Admin tem todas as permissões.")
+    edited = st.data_editor(df, use_container_width=True, num_rows="dynamic", key=editor_key(key))
+    colh1, colh2 = st.columns([1,1])
+    with colh1:
+        if st.button("Salvar usuários"):
+            # direto (sem a fila): o login passa a valer com os dados novos já no próximo acesso
+            try:
+                with st.spinner("Salvando…"):
+                    save_users_df(edited)
+            except RuntimeError as e:
+                st.error(str(e))
+            else:
+                st.session_state[f"ed_ver_{key}"] = st.session_state.get(f"ed_ver_{key}", 0) + 1
+                st.session_state.pop(f"snap_{key}", None)
+                st.rerun()
+    with colh2:
+        import bcrypt
+        with st.form("hash_form"):
+            plain = st.text_input("Gerar hash bcrypt para senha:", type="password")
+            ok = st.form_submit_button("Gerar")
+        if ok:
+            if not plain:
+                st.error("Informe uma senha.")
+            else:
+                salt = bcrypt.gensalt()
+                st.code(bcrypt.hashpw(plain.encode(), salt).decode())
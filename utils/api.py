@@ -1,73 +1,242 @@
 import streamlit as st
-import requests
-from datetime import datetime
-from zoneinfo import ZoneInfo
-
-@st.cache_data(ttl=60)
-def fetch_fx_brl():
-    """Cotações USD/BRL e EUR/BRL via exchangerate.host (sem chave)."""
-    fx = {"USD": None, "EUR": None}
-    try:
-        r = requests.get(
-            "https://api.exchangerate.host/latest",
-            params={"base": "USD", "symbols": "BRL"},
-            timeout=10
-        )
-        r.raise_for_status()
-        fx["USD"] = float(r.json()["rates"]["BRL"])
-    except Exception:
-        pass
-
-    try:
-        r = requests.get(
-            "https://api.exchangerate.host/latest",
-            params={"base": "EUR", "symbols": "BRL"},
-            timeout=10
-        )
-        r.raise_for_status()
-        fx["EUR"] = float(r.json()["rates"]["BRL"])
-    except Exception:
-        pass
-
-    return fx
-
-@st.cache_data(ttl=60)
-def fetch_crypto_brl():
-    """Cotações BTC/ETH em BRL via Coingecko."""
-    out = {"BTC": None, "ETH": None}
-    try:
-        r = requests.get(
-            "https://api.coingecko.com/api/v3/simple/price",
-            params={"ids": "bitcoin,ethereum", "vs_currencies": "brl"},
-            timeout=10
-        )
-        r.raise_for_status()
-        js = r.json()
-        out["BTC"] = float(js.get("bitcoin", {}).get("brl"))
-        out["ETH"] = float(js.get("ethereum", {}).get("brl"))
-    except Exception:
-        pass
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from utils import http_client, metrics
+
+FETCH_DEADLINE_SEC = 6   # prazo padrão de cada chamada dentro de fetch_all
+REFRESH_AHEAD = 0.8      # fração do TTL a partir da qual o valor é renovado em segundo plano
+STALE_FACTOR = 2         # valores com idade acima de STALE_FACTOR * TTL são marcados como desatualizados
+COLD_RETRY_SEC = 30      # nova tentativa de entradas que ainda não tiveram valor bom (limitada ao TTL)
+WEATHER_GRID_DEG = 0.01  # grade (graus) para agrupar coordenadas próximas no cache do tempo
+
+@st.cache_resource(show_spinner=False)
+def _fetch_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="api-fetch")
+
+def _is_good(value) -> bool:
+    if value is None:
+        return False
+    if isinstance(value, dict) and value and all(v is None for v in value.values()):
+        return False
+    return True
+
+def _merge(old, new):
+    """Dicts parciais mantêm os campos do último valor bom que vieram vazios agora."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        return {k: (v if v is not None else old.get(k)) for k, v in new.items()}
+    return new
+
+def swr_cache(ttl: float):
+    """
+    Cache stale-while-revalidate compartilhado pelo processo. Sempre devolve na hora o
+    último valor bom; a partir de REFRESH_AHEAD * ttl dispara a renovação em segundo plano.
+    Falhas do provedor (exceção, None ou dict todo vazio) nunca apagam o último valor bom;
+    sem nenhum valor bom ainda, tenta de novo a cada COLD_RETRY_SEC. A primeira busca de
+    cada chave é única: sessões simultâneas esperam por ela em vez de chamar o provedor.
+    A idade de cada entrada fica em `func.age(*args)` e `func.is_stale(*args)`.
+    """
+    def decorator(fn: Callable):
+        entries: Dict[tuple, Dict] = {}
+        lock = threading.Lock()
+        site = f"api.{fn.__name__}"
+
+        def refresh(key: tuple):
+            try:
+                with metrics.timed(site):
+                    value = fn(*key)
+            except Exception:
+                value = None
+            with lock:
+                entry = entries.setdefault(key, {"value": None, "at": None, "ready": threading.Event()})
+                if _is_good(value):
+                    entry["value"] = _merge(entry["value"], value)
+                    entry["at"] = time.time()
+                entry["refreshing"] = False
+                entry["tried_at"] = time.time()
+            entry["ready"].set()
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            key = tuple(args)
+            with lock:
+                entry = entries.get(key)
+                first = entry is None
+                if first:
+                    entry = entries[key] = {"value": None, "at": None, "tried_at": 0.0,
+                                            "refreshing": True, "ready": threading.Event()}
+            metrics.cache_hit(site, not first)
+            if first:
+                refresh(key)  # primeira vez: não há o que servir, busca na hora
+                with lock:
+                    return entry["value"]
+            if not entry["ready"].is_set():
+                entry["ready"].wait(FETCH_DEADLINE_SEC)  # outra sessão está na primeira busca
+            with lock:
+                at = entry["at"] or 0.0
+                interval = ttl * REFRESH_AHEAD if entry["at"] else min(ttl, COLD_RETRY_SEC)
+                due = time.time() - max(at, entry["tried_at"]) >= interval
+                if due and not entry["refreshing"]:
+                    entry["refreshing"] = True
+                    _fetch_pool().submit(refresh, key)
+                return entry["value"]
+
+        def age(*args) -> Optional[float]:
+            with lock:
+                entry = entries.get(tuple(args))
+            if not entry or not entry["at"]:
+                return None
+            return time.time() - entry["at"]
+
+        def is_stale(*args) -> bool:
+            a = age(*args)
+            return a is None or a > ttl * STALE_FACTOR
+
+        def clear():
+            with lock:
+                entries.clear()
+
+        wrapper.age = age
+        wrapper.is_stale = is_stale
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+# === Cotações: registro de provedores ===
+# Cada provedor recebe uma tupla de símbolos e devolve {símbolo: preço em BRL} numa
+# única requisição. Os símbolos exibidos vêm da chave "rates" da aba settings, no
+# formato "USD,EUR,BTC:coingecko" (provedor opcional; sem ele, cripto conhecida vai
+# para o coingecko e o resto para o exchangerate).
+RATE_PROVIDERS: Dict[str, Callable[[Tuple[str, ...]], Dict[str, Optional[float]]]] = {}
+DEFAULT_RATES = "USD:exchangerate,EUR:exchangerate,BTC:coingecko,ETH:coingecko"
+COINGECKO_IDS = {
+    "BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana", "XRP": "ripple",
+    "ADA": "cardano", "DOGE": "dogecoin", "USDT": "tether", "LTC": "litecoin",
+}
+
+def rate_provider(name: str):
+    """Registra uma função de cotações em RATE_PROVIDERS."""
+    def decorator(fn):
+        RATE_PROVIDERS[name] = fn
+        return fn
+    return decorator
+
+@rate_provider("exchangerate")
+def _rates_exchangerate(symbols: Tuple[str, ...]) -> Dict[str, Optional[float]]:
+    """Moedas em BRL via exchangerate.host (sem chave), todas numa chamada com base BRL."""
+    js = http_client.get_json(
+        "https://api.exchangerate.host/latest",
+        params={"base": "BRL", "symbols": ",".join(symbols)},
+        timeout=10
+    )
+    rates = js.get("rates") or {}
+    return {s: (1 / float(rates[s]) if rates.get(s) else None) for s in symbols}
+
+@rate_provider("coingecko")
+def _rates_coingecko(symbols: Tuple[str, ...]) -> Dict[str, Optional[float]]:
+    """Criptomoedas em BRL via Coingecko."""
+    ids = {s: COINGECKO_IDS.get(s, s.lower()) for s in symbols}
+    js = http_client.get_json(
+        "https://api.coingecko.com/api/v3/simple/price",
+        params={"ids": ",".join(ids.values()), "vs_currencies": "brl"},
+        timeout=10
+    )
+    out = {}
+    for s, cid in ids.items():
+        price = (js.get(cid) or {}).get("brl")
+        out[s] = float(price) if price is not None else None
     return out
 
-@st.cache_data(ttl=60)
-def now_tz(label_tz: str) -> str:
-    try:
-        now = datetime.now(ZoneInfo(label_tz))
-        return now.strftime("%H:%M")
-    except Exception:
-        return "--:--"
+def parse_rates(spec: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Converte "USD,BTC:coingecko" em [(símbolo, provedor)], ignorando provedores desconhecidos."""
+    pairs = []
+    for item in str(spec or DEFAULT_RATES).split(","):
+        symbol, _, provider = item.strip().partition(":")
+        symbol = symbol.strip().upper()
+        provider = provider.strip().lower() or ("coingecko" if symbol in COINGECKO_IDS else "exchangerate")
+        if symbol and provider in RATE_PROVIDERS and (symbol, provider) not in pairs:
+            pairs.append((symbol, provider))
+    return pairs
 
-@st.cache_data(ttl=60*15)
-def fetch_weather(lat: float, lon: float):
-    """Open-Meteo (sem chave) — tempo atual e diária."""
+def group_rates(pairs: List[Tuple[str, str]]) -> Dict[str, Tuple[str, ...]]:
+    """Agrupa os símbolos por provedor, para uma requisição por provedor."""
+    groups: Dict[str, List[str]] = {}
+    for symbol, provider in pairs:
+        groups.setdefault(provider, []).append(symbol)
+    return {provider: tuple(symbols) for provider, symbols in groups.items()}
+
+@swr_cache(ttl=60)
+def fetch_provider_rates(provider: str, symbols: Tuple[str, ...]) -> Dict[str, Optional[float]]:
+    """Cotações dos símbolos de um provedor (falha do host abre o circuito em http_client)."""
+    return RATE_PROVIDERS[provider](symbols)
+
+@swr_cache(ttl=60*15)
+def _fetch_weather_batch(coords: Tuple[Tuple[float, float], ...]) -> Dict[Tuple[float, float], dict]:
+    """Open-Meteo (sem chave) — tempo atual e diária de várias coordenadas numa só requisição."""
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": lat,
-        "longitude": lon,
+        "latitude": ",".join(str(lat) for lat, _ in coords),
+        "longitude": ",".join(str(lon) for _, lon in coords),
         "current_weather": True,
         "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max",
         "timezone": "auto",
     }
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
+    js = http_client.get_json(url, params=params, timeout=10)
+    if isinstance(js, dict):  # uma coordenada só volta como objeto, várias como lista
+        js = [js]
+    return dict(zip(coords, js))
+
+def _snap(value: float, grid: float) -> float:
+    """Arredonda a coordenada para a grade, para locais próximos dividirem a mesma entrada."""
+    return round(round(float(value) / grid) * grid, 6) if grid > 0 else float(value)
+
+def _weather_points(points: Iterable[Tuple[float, float]], grid: float):
+    snapped = {(lat, lon): (_snap(lat, grid), _snap(lon, grid)) for lat, lon in points}
+    return snapped, tuple(sorted(set(snapped.values())))
+
+def fetch_weather_many(points: Iterable[Tuple[float, float]], grid: float = WEATHER_GRID_DEG) -> Dict[Tuple[float, float], Optional[dict]]:
+    """
+    Tempo de todas as coordenadas (lat, lon) numa única chamada ao Open-Meteo, já
+    deduplicadas na grade `grid` (graus). Devolve {(lat, lon): json} no formato da API.
+    """
+    snapped, coords = _weather_points(points, grid)
+    if not coords:
+        return {}
+    batch = _fetch_weather_batch(coords) or {}
+    return {p: batch.get(c) for p, c in snapped.items()}
+
+def _weather_age(points, grid: float = WEATHER_GRID_DEG) -> Optional[float]:
+    return _fetch_weather_batch.age(_weather_points(points, grid)[1])
+
+def _weather_is_stale(points, grid: float = WEATHER_GRID_DEG) -> bool:
+    return _fetch_weather_batch.is_stale(_weather_points(points, grid)[1])
+
+fetch_weather_many.age = _weather_age
+fetch_weather_many.is_stale = _weather_is_stale
+
+def fetch_weather(lat: float, lon: float):
+    """Tempo de uma coordenada (atalho para fetch_weather_many)."""
+    return fetch_weather_many([(lat, lon)]).get((lat, lon))
+
+def fetch_all(calls: Dict[str, Tuple], deadline: Union[float, Dict[str, float]] = FETCH_DEADLINE_SEC) -> Dict[str, Any]:
+    """
+    Executa em paralelo as chamadas {chave: (função, *args)} e devolve {chave: resultado}.
+    Cada chamada tem seu prazo (`deadline`, ou um dict {chave: segundos}); as que falham
+    ou não terminam a tempo voltam como None, sem segurar as demais.
+    """
+    pool = _fetch_pool()
+    start = time.monotonic()
+    futures = {key: pool.submit(fn, *args) for key, (fn, *args) in calls.items()}
+    out: Dict[str, Any] = {}
+    for key, fut in futures.items():
+        limit = deadline.get(key, FETCH_DEADLINE_SEC) if isinstance(deadline, dict) else deadline
+        try:
+            out[key] = fut.result(timeout=max(0.0, start + limit - time.monotonic()))
+            metrics.record(f"fetch_all.{key}", (time.monotonic() - start) * 1000)
+        except Exception as e:
+            metrics.record(f"fetch_all.{key}", (time.monotonic() - start) * 1000, e)
+            out[key] = None
+    return out
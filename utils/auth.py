@@ -1,25 +1,114 @@
 import streamlit as st
 import pandas as pd
 import bcrypt
-from sheets import read_df, write_df
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from types import MappingProxyType
+from typing import Deque, Dict, Mapping, Optional
+from utils.sheets import read_df, write_df
+from utils.schemas import get_schema
 
-USERS_HEADERS = [
-    "username","display_name","password_hash","role",
-    "can_news","can_videos","can_birthdays","can_weather",
-    "can_rates","can_clocks","can_users","is_active"
-]
+USERS_HEADERS = get_schema("users").headers
+
+BCRYPT_WORKERS = 2        # verificações bcrypt simultâneas (limita o uso de CPU)
+BCRYPT_QUEUE = 8          # verificações aguardando além das que estão rodando
+BCRYPT_TIMEOUT = 10
+LOGIN_MAX_ATTEMPTS = 5    # tentativas por usuário e por IP dentro da janela
+LOGIN_WINDOW_SEC = 60
 
 @st.cache_data(ttl=30)
 def load_users_df() -> pd.DataFrame:
-    df = read_df("users", USERS_HEADERS)
-    # normaliza booleanos
-    for col in [c for c in USERS_HEADERS if c.startswith("can_") or c == "is_active"]:
-        df[col] = df[col].astype(str).str.upper().isin(["TRUE","1","YES","SIM","Y"])
-    return df
+    # booleanos já chegam normalizados pelo schema
+    return read_df("users", USERS_HEADERS)
+
+@st.cache_resource(ttl=30, show_spinner=False)
+def load_user_index() -> Mapping[str, Mapping]:
+    """Usuários por username normalizado (minúsculo); vale o primeiro em caso de repetição."""
+    index: Dict[str, Mapping] = {}
+    for row in load_users_df().to_dict("records"):
+        index.setdefault(str(row["username"]).strip().lower(), MappingProxyType(row))
+    return MappingProxyType(index)
 
 def save_users_df(df: pd.DataFrame):
     write_df("users", USERS_HEADERS, df)
     load_users_df.clear()
+    load_user_index.clear()
+
+# === Verificação de senha ===
+class _Verifier:
+    """Pool limitado para o bcrypt: logins em rajada esperam a vez ou são recusados."""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+        self.slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_QUEUE)
+
+    def check(self, plain: str, hashed: str) -> Optional[bool]:
+        """True/False pela senha; None se o pool estiver lotado ou a verificação demorar demais."""
+        if not self.slots.acquire(blocking=False):
+            return None
+        try:
+            fut = self.pool.submit(bcrypt.checkpw, plain.encode(), hashed.encode())
+        except Exception:
+            self.slots.release()
+            raise
+        fut.add_done_callback(lambda _: self.slots.release())
+        try:
+            return fut.result(timeout=BCRYPT_TIMEOUT)
+        except FutureTimeout:
+            return None
+        except ValueError:
+            return False  # hash malformado na planilha
+
+@st.cache_resource(show_spinner=False)
+def _verifier() -> _Verifier:
+    return _Verifier()
+
+class _Throttle:
+    """Janela deslizante de tentativas de login por chave (usuário ou IP)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.attempts: Dict[str, Deque[float]] = {}
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        q = self.attempts.setdefault(key, deque())
+        while q and now - q[0] > LOGIN_WINDOW_SEC:
+            q.popleft()
+        return q
+
+    def hit(self, *keys: str) -> float:
+        """Registra a tentativa; devolve quantos segundos esperar (0 = liberado)."""
+        now = time.time()
+        with self.lock:
+            recent = [self._recent(k, now) for k in keys]
+            wait = max((LOGIN_WINDOW_SEC - (now - q[0]) for q in recent if len(q) >= LOGIN_MAX_ATTEMPTS),
+                       default=0.0)
+            if wait <= 0:
+                for q in recent:
+                    q.append(now)
+            # descarta chaves sem tentativas recentes para o dicionário não crescer
+            for k in [k for k, q in self.attempts.items() if not q]:
+                del self.attempts[k]
+            return wait
+
+    def reset(self, key: str):
+        with self.lock:
+            self.attempts.pop(key, None)
+
+@st.cache_resource(show_spinner=False)
+def _throttle() -> _Throttle:
+    return _Throttle()
+
+def _client_ip() -> str:
+    """
+    IP para o limite de tentativas: o último salto do X-Forwarded-For, que é o que o
+    proxy acrescentou (os da esquerda vêm do próprio cliente e podem ser forjados).
+    """
+    ctx = st.context
+    forwarded = str(ctx.headers.get("X-Forwarded-For", "") or "").split(",")[-1].strip()
+    return forwarded or str(getattr(ctx, "ip_address", None) or "?")
 
 def ensure_admin_bootstrap_ui():
     df = load_users_df()
@@ -60,6 +149,7 @@ def ensure_admin_bootstrap_ui():
                 }
                 write_df("users", USERS_HEADERS, pd.DataFrame([new]))
             else:
+                df = get_schema("users").editable(df)
                 mask = df["username"].astype(str).str.lower() == username.lower()
                 if mask.any():
                     df.loc[mask, [
@@ -73,16 +163,16 @@ def ensure_admin_bootstrap_ui():
                 save_users_df(df)
 
             st.success("Admin criado. Faça login.")
-            st.experimental_rerun()
+            st.rerun()
 
         st.stop()
 
 class CurrentUser:
-    def __init__(self, row: pd.Series):
+    def __init__(self, row: Mapping):
         self.username = row["username"]
         self.display_name = row["display_name"]
         self.role = str(row["role"]).lower()
-        self.perms = {k: bool(row[k]) for k in row.index if k.startswith("can_")}
+        self.perms = {k: bool(row[k]) for k in row.keys() if k.startswith("can_")}
         self.active = bool(row.get("is_active", True))
 
     def can(self, key: str) -> bool:
@@ -93,26 +183,31 @@ def login_ui():
     if st.session_state["__user__"]:
         return st.session_state["__user__"]
 
-    df = load_users_df()
     with st.form("login"):
         u = st.text_input("Usuário")
         p = st.text_input("Senha", type="password")
         ok = st.form_submit_button("Entrar")
 
     if ok:
-        row = df.loc[df["username"].astype(str).str.lower() == u.lower()]
-        if row.empty:
+        key = u.strip().lower()
+        wait = _throttle().hit(f"user:{key}", f"ip:{_client_ip()}")
+        if wait > 0:
+            st.error(f"Muitas tentativas. Tente novamente em {int(wait) + 1}s.")
+            return None
+        row = load_user_index().get(key)
+        if row is None:
             st.error("Usuário não encontrado")
+        elif not row.get("is_active", True):
+            st.error("Usuário desativado")
         else:
-            row = row.iloc[0]
-            if not row.get("is_active", True):
-                st.error("Usuário desativado")
+            ph = str(row.get("password_hash", ""))
+            valid = _verifier().check(p, ph) if ph else False
+            if valid is None:
+                st.error("Servidor ocupado verificando outros logins. Tente novamente.")
+            elif valid:
+                _throttle().reset(f"user:{key}")
+                st.session_state["__user__"] = CurrentUser(row)
+                st.rerun()
             else:
-                ph = str(row.get("password_hash", ""))
-                if ph and bcrypt.checkpw(p.encode(), ph.encode()):
-                    user = CurrentUser(row)
-                    st.session_state["__user__"] = user
-                    st.experimental_rerun()
-                else:
-                    st.error("Senha inválida")
+                st.error("Senha inválida")
     return None
@@ -0,0 +1,106 @@
+import streamlit as st
+import pandas as pd
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Índice de aniversariantes por (mês, dia). É montado uma vez por revisão do backend
+# (a mesma que invalida os snapshots, sem reler ou hashear a aba a cada tick); as
+# seleções de hoje/semana/mês são calculadas uma vez por data local (no fuso
+# configurado) e cada renderização só consulta o resultado pronto.
+
+BIRTHDAY_MODES = {
+    "today": "Aniversariantes de hoje",
+    "week": "Aniversariantes da semana",
+    "month": "Aniversariantes do mês",
+}
+DEFAULT_MODE = "month"
+DEFAULT_TZ = "America/Sao_Paulo"
+
+def local_today(tz: str) -> date:
+    try:
+        return datetime.now(ZoneInfo(tz)).date()
+    except Exception:
+        return datetime.now(ZoneInfo(DEFAULT_TZ)).date()
+
+def _fingerprint(df: pd.DataFrame) -> int:
+    """Versão pelo conteúdo, só quando não há revisão do backend (O(n) por chamada)."""
+    return int(pd.util.hash_pandas_object(df, index=False).sum()) if len(df) else 0
+
+def _week(today: date) -> List[date]:
+    """Segunda a domingo da semana de `today` (pode cruzar o mês ou o ano)."""
+    monday = today - timedelta(days=today.weekday())
+    return [monday + timedelta(days=i) for i in range(7)]
+
+def _is_leap(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+class BirthdayIndex:
+    """Posições das linhas ativas por (mês, dia), já na ordem de exibição."""
+
+    def __init__(self, df: pd.DataFrame):
+        active = df[df["is_active"] & df["month"].notna() & df["day"].notna()]
+        active = active.sort_values(["month", "day", "order"], kind="stable")
+        self.rows = active.reset_index(drop=True)
+        self.by_day: Dict[Tuple[int, int], List[int]] = {}
+        for pos, key in enumerate(zip(self.rows["month"].astype(int), self.rows["day"].astype(int))):
+            self.by_day.setdefault(key, []).append(pos)
+        self.by_month: Dict[int, List[int]] = {}
+        for (month, _), positions in sorted(self.by_day.items()):
+            self.by_month.setdefault(month, []).extend(positions)
+
+    def on(self, d: date) -> List[int]:
+        out = list(self.by_day.get((d.month, d.day), []))
+        if d.month == 2 and d.day == 28 and not _is_leap(d.year):
+            out += self.by_day.get((2, 29), [])  # 29/02 comemora em 28/02 nos anos comuns
+        return out
+
+    def selections(self, today: date) -> Dict[str, pd.DataFrame]:
+        """DataFrames de hoje/semana/mês para a data dada."""
+        picks = {
+            "today": self.on(today),
+            "week": [p for d in _week(today) for p in self.on(d)],
+            "month": self.by_month.get(today.month, []),
+        }
+        return {mode: self.rows.iloc[positions].reset_index(drop=True) for mode, positions in picks.items()}
+
+class _BirthdayEngine:
+    """Índice atual e seleções do dia por fuso; refeitos só quando a aba ou a data mudam."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version: Optional[Tuple[str, object]] = None
+        self.index: Optional[BirthdayIndex] = None
+        self.days: Dict[str, Tuple[date, Dict[str, pd.DataFrame]]] = {}  # fuso -> (data, seleções)
+
+    def select(self, df: pd.DataFrame, mode: str, tz: str, revision: Optional[str]) -> pd.DataFrame:
+        version = ("rev", revision) if revision is not None else ("hash", _fingerprint(df))
+        today = local_today(tz)
+        with self.lock:
+            if version != self.version or self.index is None:
+                self.index = BirthdayIndex(df)
+                self.version = version
+                self.days.clear()
+            day = self.days.get(tz)
+            if day is None or day[0] != today:
+                day = (today, self.index.selections(today))
+                self.days[tz] = day
+            return day[1].get(mode, day[1][DEFAULT_MODE])
+
+@st.cache_resource(show_spinner=False)
+def _engine() -> _BirthdayEngine:
+    return _BirthdayEngine()
+
+def birthday_mode(value) -> str:
+    mode = str(value or "").strip().lower()
+    return mode if mode in BIRTHDAY_MODES else DEFAULT_MODE
+
+def select_birthdays(df: pd.DataFrame, mode: str = DEFAULT_MODE, tz: str = DEFAULT_TZ,
+                     revision: Optional[str] = None) -> pd.DataFrame:
+    """
+    Aniversariantes ativos de hoje, da semana ou do mês na data local de `tz`. `revision`
+    é a revisão do backend lida antes de `df` (storage_revision); sem ela, o índice é
+    versionado pelo conteúdo.
+    """
+    return _engine().select(df, birthday_mode(mode), tz, revision)
@@ -0,0 +1,252 @@
+import streamlit as st
+import pandas as pd
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from functools import partial
+from typing import Dict, Mapping, Optional, Tuple
+
+from utils import images, metrics, player
+from utils.birthdays import BIRTHDAY_MODES, DEFAULT_TZ, birthday_mode, select_birthdays
+from utils.sheets import has_pending_write, read_active, read_many, storage_revision
+from utils.api import (
+    fetch_all, fetch_provider_rates, fetch_weather_many, group_rates, parse_rates,
+    WEATHER_GRID_DEG,
+)
+
+# Modo canal: um produtor por canal (?channel=...) monta o estado de renderização uma
+# vez por tick e todas as TVs do canal leem o mesmo snapshot imutável. O custo de
+# Sheets/APIs/CPU fica constante com o número de telas.
+
+DEFAULT_CHANNEL = "default"
+CHANNEL_TICK_SEC = 10  # idade máxima do estado de um canal
+CHANNEL_IDLE_SEC = 3600  # canal sem nenhuma TV lendo há mais que isso sai da memória
+
+RATE_LABELS = {
+    "USD": "Dólar (USD → BRL)",
+    "EUR": "Euro (EUR → BRL)",
+    "BTC": "Bitcoin (BTC)",
+    "ETH": "Ethereum (ETH)",
+}
+
+@dataclass(frozen=True)
+class ChannelState:
+    channel: str
+    built_at: float
+    settings: Mapping[str, str]
+    refresh_sec: int
+    weather_refresh_sec: int
+    rates_refresh_sec: int
+    news: Tuple[Mapping, ...]        # slides prontos para player.rotator
+    birthdays: Tuple[Mapping, ...]
+    birthdays_title: str             # conforme birthdays_mode (hoje / semana / mês)
+    videos: Tuple[Mapping, ...]
+    clocks: Tuple[Mapping, ...]      # {"label", "tz"}
+    weather_line: Optional[str]      # None = nenhum local cadastrado
+    quotes: Tuple[Tuple[str, str], ...]  # (rótulo, valor formatado)
+
+def channel_settings(df: pd.DataFrame, channel: str) -> Dict[str, str]:
+    """Chaves da aba settings; "<canal>.<chave>" sobrepõe a chave global para o canal."""
+    out, scoped = {}, {}
+    prefix = f"{channel}."
+    for key, value in zip(df["key"].astype(str), df["value"].astype(str)):
+        if key.startswith(prefix):
+            scoped[key[len(prefix):]] = value
+        elif "." not in key:
+            out[key] = value
+    out.update(scoped)
+    return out
+
+def known_channels(df: pd.DataFrame) -> set:
+    """Canais com alguma chave "<canal>.<chave>" na aba settings, mais o padrão."""
+    keys = df["key"].astype(str)
+    return {DEFAULT_CHANNEL} | {k.split(".", 1)[0].strip().lower() for k in keys if "." in k}
+
+def setting(settings: Mapping[str, str], key: str, default, cast=int):
+    try:
+        return cast(settings[key]) if key in settings else default
+    except Exception:
+        return default
+
+def fmt_brl(v: float) -> str:
+    if v >= 1000:
+        return f"R$ {v:,.0f}".replace(",", ".")
+    return f"R$ {v:.2f}"
+
+def stale_mark(fetch, *args) -> str:
+    """Sinaliza valor servido do último dado bom além do prazo (provedor fora do ar)."""
+    return " ⚠" if fetch.age(*args) is not None and fetch.is_stale(*args) else ""
+
+def _slot(slides: Tuple[Mapping, ...], now_ms: int) -> int:
+    """Mesmo cálculo do player no navegador: posição no ciclo pelo relógio."""
+    total = sum(s["ms"] for s in slides)
+    if not total:
+        return 0
+    t = now_ms % total
+    for i, s in enumerate(slides):
+        if t < s["ms"]:
+            return i
+        t -= s["ms"]
+    return 0
+
+def _weather_line(locs: pd.DataFrame, weather: Dict, points, grid: float) -> Optional[str]:
+    if locs.empty:
+        return None
+    parts = []
+    for loc in locs.itertuples(index=False):
+        try:
+            js = weather.get((float(loc.lat), float(loc.lon)))
+            cur = js.get("current_weather", {})
+            daily = js.get("daily", {})
+            t = cur.get("temperature")
+            tmax = daily.get("temperature_2m_max", [None])[0]
+            tmin = daily.get("temperature_2m_min", [None])[0]
+            parts.append(f"{loc.label}: {t}°C (min {tmin}°C / max {tmax}°C)")
+        except Exception:
+            parts.append(f"{loc.label}: --°C")
+    return "  •  ".join(parts) + stale_mark(fetch_weather_many, points, grid)
+
+def _frozen(slides) -> Tuple[Mapping, ...]:
+    return tuple(MappingProxyType(s) for s in slides)
+
+def _prefetch_playlist(urls: pd.Series, slot: int, width: int):
+    """
+    Baixa (em segundo plano) todas as imagens da rotação, a partir do item atual: entre
+    duas montagens a TV passa por vários itens, e as que já estão no cache são puladas.
+    """
+    n = len(urls)
+    if n:
+        images.prefetch([urls.iloc[(slot + k) % n] for k in range(n)], width)
+
+@metrics.instrument("channel.build")
+def build_state(channel: str) -> ChannelState:
+    """Monta o estado de renderização do canal (Sheets + provedores), uma vez por tick."""
+    # revisão lida antes dos dados: se eles forem mais novos, a próxima montagem refaz o índice;
+    # com gravação na fila, birthdays vem da fila e não corresponde a revisão nenhuma
+    revision = None if has_pending_write("birthdays") else storage_revision()
+    # uma leitura só: playlists já filtradas para as linhas ativas, settings/birthdays inteiras
+    data = read_active(["news", "videos", "weather", "clocks"], full=["settings", "birthdays"])
+    settings = channel_settings(data["settings"], channel)
+    news_ms = setting(settings, "news_interval_sec", 10) * 1000
+    bday_ms = setting(settings, "birthdays_interval_sec", 10) * 1000
+    video_ms = setting(settings, "video_interval_sec", 45) * 1000
+    grid = setting(settings, "weather_grid_deg", WEATHER_GRID_DEG, float)
+    rates = parse_rates(settings.get("rates"))
+
+    locs = data["weather"]
+    points = [(float(loc.lat), float(loc.lon)) for loc in locs.itertuples(index=False)
+              if pd.notna(loc.lat) and pd.notna(loc.lon)]
+    groups = group_rates(rates)
+    calls = {f"rates_{p}": (fetch_provider_rates, p, syms) for p, syms in groups.items()}
+    calls["weather"] = (fetch_weather_many, points, grid)
+    results = fetch_all(calls)
+
+    quotes, marks = {}, {}
+    for provider, symbols in groups.items():
+        mark = stale_mark(fetch_provider_rates, provider, symbols)
+        for sym, value in (results.get(f"rates_{provider}") or {}).items():
+            quotes[sym], marks[sym] = value, mark
+
+    width = setting(settings, "image_width", images.IMAGE_MAX_WIDTH)
+    src = partial(images.proxied_url, width=width)
+    bday_mode = birthday_mode(settings.get("birthdays_mode"))
+    news_df = data["news"]
+    bday_df = select_birthdays(data["birthdays"], bday_mode, settings.get("timezone", DEFAULT_TZ), revision)
+    news = _frozen(player.news_slides(news_df, news_ms, src))
+    birthdays = _frozen(player.birthday_slides(bday_df, bday_ms, src))
+    videos = _frozen(player.video_slides(data["videos"], video_ms))
+    now = time.time()
+    now_ms = int(now * 1000)
+    _prefetch_playlist(news_df["image_url"], _slot(news, now_ms), width)
+    _prefetch_playlist(bday_df["photo_url"], _slot(birthdays, now_ms), width)
+    return ChannelState(
+        channel=channel,
+        built_at=now,
+        settings=MappingProxyType(settings),
+        refresh_sec=setting(settings, "refresh_interval_sec", 60),
+        weather_refresh_sec=setting(settings, "weather_refresh_sec", 300),
+        rates_refresh_sec=setting(settings, "rates_refresh_sec", 60),
+        news=news,
+        birthdays=birthdays,
+        birthdays_title=BIRTHDAY_MODES[bday_mode],
+        videos=videos,
+        clocks=tuple(MappingProxyType({"label": c.label, "tz": str(c.tz)})
+                     for c in data["clocks"].itertuples(index=False)),
+        weather_line=_weather_line(locs, results.get("weather") or {}, points, grid),
+        quotes=tuple(
+            (RATE_LABELS.get(sym, f"{sym} → BRL"),
+             fmt_brl(quotes[sym]) + marks[sym] if quotes.get(sym) else "--")
+            for sym, _ in rates
+        ),
+    )
+
+class _Channels:
+    """Estado atual de cada canal e o lock do seu produtor."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states: Dict[str, ChannelState] = {}
+        self.producers: Dict[str, threading.Lock] = {}
+        self.seen: Dict[str, float] = {}
+
+    def producer(self, channel: str) -> threading.Lock:
+        with self.lock:
+            return self.producers.setdefault(channel, threading.Lock())
+
+    def touch(self, channel: str):
+        """Marca o canal como lido agora e descarta os que ficaram sem TVs."""
+        now = time.time()
+        with self.lock:
+            self.seen[channel] = now
+            for idle in [c for c, t in self.seen.items() if now - t > CHANNEL_IDLE_SEC]:
+                self.seen.pop(idle, None)
+                self.states.pop(idle, None)
+                lock = self.producers.get(idle)
+                if lock is not None and not lock.locked():
+                    del self.producers[idle]
+
+@st.cache_resource(show_spinner=False)
+def _channels() -> _Channels:
+    return _Channels()
+
+def get_channel_state(channel: str = DEFAULT_CHANNEL) -> ChannelState:
+    """
+    Estado compartilhado do canal. Vencido o tick, só uma sessão reconstrói; as demais
+    seguem com o estado anterior (ou esperam, se o canal ainda não tem nenhum).
+    """
+    store = _channels()
+    store.touch(channel)
+    state = store.states.get(channel)
+    fresh = state is not None and time.time() - state.built_at < CHANNEL_TICK_SEC
+    metrics.cache_hit("channel.state", fresh)
+    if fresh:
+        return state
+    producer = store.producer(channel)
+    if not producer.acquire(blocking=state is None):
+        return state
+    try:
+        current = store.states.get(channel)
+        if current is not None and time.time() - current.built_at < CHANNEL_TICK_SEC:
+            return current  # outra sessão reconstruiu enquanto esperávamos
+        try:
+            state = build_state(channel)
+        except Exception:
+            if current is None:
+                raise
+            return current  # falha ao montar: as TVs seguem no último estado bom
+        store.states[channel] = state
+        return state
+    finally:
+        producer.release()
+
+def current_channel() -> str:
+    """Canal pedido na URL (?channel=...); canal fora da aba settings cai no padrão."""
+    channel = str(st.query_params.get("channel", DEFAULT_CHANNEL)).strip().lower() or DEFAULT_CHANNEL
+    if channel == DEFAULT_CHANNEL:
+        return channel
+    try:
+        known = known_channels(read_many(["settings"])["settings"])
+    except Exception:
+        return DEFAULT_CHANNEL
+    return channel if channel in known else DEFAULT_CHANNEL
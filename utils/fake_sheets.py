@@ -0,0 +1,242 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+# Planilha em memória que imita a parte do gspread usada por utils.sheets. Serve para
+# rodar a camada de armazenamento sem credenciais (benchmarks, demonstrações offline):
+#   client = FakeClient(latency=0.05, quota_error_rate=0.01)
+#   sheets.install_client(client)
+# Cada chamada de API soma em `client.calls`, espera `latency` segundos e pode falhar
+# com um APIError 429 simulado.
+
+class _Response:
+    """Resposta mínima: o suficiente para APIError e para a leitura de revisão."""
+
+    def __init__(self, status_code: int, payload: Dict):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = str(payload)
+
+    def json(self) -> Dict:
+        return self.payload
+
+def quota_error() -> APIError:
+    return APIError(_Response(429, {"error": {
+        "code": 429, "status": "RESOURCE_EXHAUSTED",
+        "message": "Quota exceeded for quota metric 'Read requests' (simulado).",
+    }}))
+
+def not_found_error(what: str) -> APIError:
+    return APIError(_Response(400, {"error": {
+        "code": 400, "status": "INVALID_ARGUMENT", "message": f"Unable to parse range: {what}",
+    }}))
+
+def _tab_name(a1: str) -> str:
+    name = a1.split("!")[0]
+    if name.startswith("'") and name.endswith("'"):
+        name = name[1:-1].replace("''", "'")
+    return name
+
+class FakeClient:
+    """Cliente com latência e erros de cota configuráveis; guarda as planilhas abertas."""
+
+    def __init__(self, latency: float = 0.0, quota_error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.random = random.Random(seed)
+        self.calls: Counter = Counter()
+        self.lock = threading.RLock()
+        self.spreadsheets: Dict[str, "FakeSpreadsheet"] = {}
+        self.http_client = _FakeHTTP(self)
+
+    def api(self, op: str):
+        """Contabiliza uma chamada de API, aplica a latência e sorteia o erro de cota."""
+        with self.lock:
+            self.calls[op] += 1
+            fail = self.quota_error_rate and self.random.random() < self.quota_error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            with self.lock:
+                self.calls["quota_error"] += 1
+            raise quota_error()
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls.clear()
+
+    def total_calls(self) -> int:
+        with self.lock:
+            return sum(n for op, n in self.calls.items() if op != "quota_error")
+
+    def open_by_key(self, key: str) -> "FakeSpreadsheet":
+        self.api("open_by_key")
+        with self.lock:
+            return self.spreadsheets.setdefault(key, FakeSpreadsheet(self, key))
+
+class _FakeHTTP:
+    """Atende só o GET de metadados do Drive (version/modifiedTime)."""
+
+    def __init__(self, client: FakeClient):
+        self.client = client
+
+    def request(self, method: str, url: str, params: Optional[Dict] = None, **kwargs) -> _Response:
+        self.client.api("drive_revision")
+        sh = self.client.spreadsheets.get(url.rstrip("/").rsplit("/", 1)[-1])
+        if sh is None:
+            return _Response(404, {"error": {"code": 404, "message": "File not found", "status": "NOT_FOUND"}})
+        return _Response(200, {"version": str(sh.version), "modifiedTime": sh.modified_time})
+
+class FakeSpreadsheet:
+    def __init__(self, client: FakeClient, key: str):
+        self.client = client
+        self.id = key
+        self.tabs: Dict[str, "FakeWorksheet"] = {}
+        self.version = 1
+        self.modified_time = datetime.now(timezone.utc).isoformat()
+
+    def touch(self):
+        with self.client.lock:
+            self.version += 1
+            self.modified_time = datetime.now(timezone.utc).isoformat()
+
+    def worksheets(self) -> List["FakeWorksheet"]:
+        self.client.api("worksheets")
+        return list(self.tabs.values())
+
+    def worksheet(self, title: str) -> "FakeWorksheet":
+        self.client.api("worksheet")
+        if title not in self.tabs:
+            raise WorksheetNotFound(title)
+        return self.tabs[title]
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26) -> "FakeWorksheet":
+        self.client.api("add_worksheet")
+        ws = self.seed(title, [])
+        ws.row_count, ws.col_count = rows, cols
+        return ws
+
+    def values_batch_get(self, ranges: List[str]) -> Dict:
+        self.client.api("values_batch_get")
+        out = []
+        with self.client.lock:
+            for a1 in ranges:
+                name = _tab_name(a1)
+                if name not in self.tabs:
+                    raise not_found_error(a1)
+                out.append({"range": a1, "values": self.tabs[name].values_in(a1)})
+        return {"spreadsheetId": self.id, "valueRanges": out}
+
+    def seed(self, title: str, values: List[List[str]]) -> "FakeWorksheet":
+        """Cria/substitui a aba com os valores dados (sem contar chamadas de API)."""
+        with self.client.lock:
+            ws = FakeWorksheet(self, title, [[str(v) for v in r] for r in values])
+            self.tabs[title] = ws
+            self.touch()
+            return ws
+
+class FakeWorksheet:
+    def __init__(self, sh: FakeSpreadsheet, title: str, values: List[List[str]]):
+        self.spreadsheet = sh
+        self.client = sh.client
+        self.title = title
+        self.values = values
+        self.row_count = max(1000, len(values))
+        self.col_count = max([26] + [len(r) for r in values])
+
+    def trimmed(self) -> List[List[str]]:
+        """Como a API devolve: sem linhas e colunas vazias no fim."""
+        rows = [list(r) for r in self.values]
+        for r in rows:
+            while r and r[-1] == "":
+                r.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def values_in(self, a1: str) -> List[List[str]]:
+        """Valores de "aba" ou "aba!A2:C9" (também "B2:B"), aparados como na API."""
+        rows = self.trimmed()
+        if "!" not in a1:
+            return rows
+        grid = a1_range_to_grid_range(a1.split("!", 1)[1])
+        c0, c1 = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+        rows = [r[c0:c1] for r in rows[grid.get("startRowIndex", 0):grid.get("endRowIndex")]]
+        for r in rows:
+            while r and r[-1] == "":
+                r.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _write(self, a1: str, values: List[List]):
+        grid = a1_range_to_grid_range(a1)
+        r0 = grid.get("startRowIndex", 0)
+        c0 = grid.get("startColumnIndex", 0)
+        end = r0 + len(values)
+        if end > self.row_count:
+            raise APIError(_Response(400, {"error": {
+                "code": 400, "status": "INVALID_ARGUMENT",
+                "message": f"Range ({self.title}!{a1}) exceeds grid limits. Max rows: {self.row_count}",
+            }}))
+        while len(self.values) < end:
+            self.values.append([])
+        for i, row in enumerate(values):
+            target = self.values[r0 + i]
+            if len(target) < c0 + len(row):
+                target.extend([""] * (c0 + len(row) - len(target)))
+            target[c0:c0 + len(row)] = ["" if v is None else str(v) for v in row]
+
+    def get(self, a1: str) -> List[List[str]]:
+        self.client.api("get")
+        grid = a1_range_to_grid_range(a1)
+        with self.client.lock:
+            rows = [list(r) for r in self.values[grid.get("startRowIndex", 0):grid.get("endRowIndex", len(self.values))]]
+        for r in rows:
+            while r and r[-1] == "":
+                r.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def update(self, a1: str, values: List[List]):
+        self.client.api("update")
+        with self.client.lock:
+            self._write(a1, values)
+            self.spreadsheet.touch()
+
+    def batch_update(self, data: List[Dict]):
+        self.client.api("batch_update")
+        with self.client.lock:
+            for item in data:
+                self._write(item["range"], item["values"])
+            self.spreadsheet.touch()
+
+    def batch_clear(self, ranges: List[str]):
+        self.client.api("batch_clear")
+        with self.client.lock:
+            for a1 in ranges:
+                grid = a1_range_to_grid_range(a1)
+                for r in range(grid.get("startRowIndex", 0), min(grid.get("endRowIndex", len(self.values)), len(self.values))):
+                    self.values[r] = []
+            self.spreadsheet.touch()
+
+    def add_rows(self, rows: int):
+        self.client.api("add_rows")
+        with self.client.lock:
+            self.row_count += rows
+
+    def delete_rows(self, start_index: int, end_index: Optional[int] = None):
+        """Remove as linhas start_index..end_index (1-based, inclusivo), como no gspread."""
+        self.client.api("delete_rows")
+        end_index = end_index or start_index
+        with self.client.lock:
+            del self.values[start_index - 1:end_index]
+            self.row_count -= end_index - start_index + 1
+            self.spreadsheet.touch()
@@ -0,0 +1,150 @@
+import streamlit as st
+import requests
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import metrics
+
+POOL_HOSTS = 16         # quantos hosts mantêm pool de conexões abertas
+POOL_PER_HOST = 4       # conexões simultâneas por host
+RETRIES = 2
+RETRY_BACKOFF = 0.5     # 0.5s, 1s, ... entre tentativas
+CONDITIONAL_MAX = 256   # respostas guardadas para revalidação (ETag / Last-Modified)
+BREAKER_FAILURES = 3    # falhas seguidas que abrem o circuito de um host
+BREAKER_COOLDOWN = 120  # segundos pulando o host depois de aberto o circuito
+
+class CircuitOpenError(RuntimeError):
+    """O host está em cooldown após falhas seguidas; a chamada nem foi feita."""
+
+@st.cache_resource(show_spinner=False)
+def get_session() -> requests.Session:
+    """Sessão HTTP única do processo: keep-alive, gzip e retries com backoff."""
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_PER_HOST,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "User-Agent": "tv-corporativa/1.0"})
+    return session
+
+class _ConditionalCache:
+    """Última resposta de cada URL com seus validadores, para requisições condicionais."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, entry: Dict):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > CONDITIONAL_MAX:
+                self.entries.popitem(last=False)
+
+@st.cache_resource(show_spinner=False)
+def _conditional_cache() -> _ConditionalCache:
+    return _ConditionalCache()
+
+class _Breaker:
+    """Circuit breaker simples por host: abre após BREAKER_FAILURES falhas seguidas."""
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+    def allow(self) -> bool:
+        # passado o cooldown, deixa uma tentativa passar (meio-aberto)
+        return time.time() >= self.open_until
+
+    def success(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= BREAKER_FAILURES:
+            self.open_until = time.time() + BREAKER_COOLDOWN
+
+@st.cache_resource(show_spinner=False)
+def _breakers() -> Dict[str, _Breaker]:
+    metrics.register_state("breakers", breaker_state)  # aparece na aba Diagnóstico
+    return {}
+
+def breaker_state() -> Dict[str, Dict]:
+    """Situação dos circuitos por host (falhas seguidas e até quando está aberto)."""
+    return {host: {"failures": b.failures, "open_until": b.open_until} for host, b in list(_breakers().items())}
+
+def get_json(url: str, params: Optional[Dict] = None, timeout: float = 10):
+    """
+    GET com If-None-Match / If-Modified-Since: se o provedor responder 304,
+    reaproveita o corpo guardado da resposta anterior. Hosts com o circuito aberto
+    falham na hora com CircuitOpenError, sem esperar o timeout.
+    """
+    host = urlparse(url).netloc
+    site = f"http.{host}"
+    breaker = _breakers().setdefault(host, _Breaker())
+    if not breaker.allow():
+        err = CircuitOpenError(f"{host} em cooldown após falhas seguidas.")
+        metrics.record(site, 0.0, err)
+        raise err
+    try:
+        with metrics.timed(site):
+            body = _get_json(url, params, timeout)
+    except Exception:
+        breaker.failure()
+        raise
+    breaker.success()
+    return body
+
+def _get_json(url: str, params: Optional[Dict], timeout: float):
+    key = (url, tuple(sorted((params or {}).items())))
+    cache = _conditional_cache()
+    cached = cache.get(key)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    r = get_session().get(url, params=params, headers=headers, timeout=timeout)
+    if cached:
+        metrics.cache_hit(f"http.{urlparse(url).netloc}", r.status_code == 304)
+    if r.status_code == 304 and cached:
+        return cached["body"]
+    r.raise_for_status()
+    body = r.json()
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    if etag or last_modified:
+        cache.put(key, {"etag": etag, "last_modified": last_modified, "body": body})
+    return body
+
+def head(url: str, timeout: float = 8) -> requests.Response:
+    """HEAD seguindo redirecionamentos, pela sessão compartilhada."""
+    with metrics.timed(f"http.head.{urlparse(url).netloc}"):
+        return get_session().head(url, allow_redirects=True, timeout=timeout)
@@ -0,0 +1,137 @@
+import streamlit as st
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable
+
+from PIL import Image, ImageOps
+
+from utils import http_client, metrics
+
+# Proxy de imagens: cada foto/banner é baixado uma vez, reduzido para a resolução da
+# TV e regravado como JPEG leve em static/img_cache, servido pelo próprio Streamlit
+# (server.enableStaticServing). Enquanto a cópia local não existe, a TV usa a URL
+# original; o produtor do canal pré-busca todas as imagens das rotações ativas.
+
+IMAGE_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "static", "img_cache")
+IMAGE_STATIC_URL = "app/static/img_cache"  # relativo à página (também dentro do iframe)
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024  # teto do cache em disco (LRU por mtime)
+IMAGE_MAX_DOWNLOAD = 25 * 1024 * 1024      # ignora arquivos maiores que isso
+IMAGE_MAX_WIDTH = 1280                     # largura padrão de exibição
+IMAGE_QUALITY = 82
+DOWNLOAD_TIMEOUT = 15
+IMAGE_RETRY_SEC = 300  # espera antes de tentar de novo uma imagem que falhou
+
+def _name(src: str, width: int) -> str:
+    return hashlib.sha1(f"{src}|{width}".encode()).hexdigest() + ".jpg"
+
+def _shrink(data: bytes, width: int) -> bytes:
+    """Reduz para no máximo `width` px de largura e recodifica como JPEG progressivo."""
+    with Image.open(io.BytesIO(data)) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        out = io.BytesIO()
+        im.save(out, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+def _download(src: str) -> bytes:
+    with http_client.get_session().get(src, timeout=DOWNLOAD_TIMEOUT, stream=True) as r:
+        r.raise_for_status()
+        buf = io.BytesIO()
+        for chunk in r.iter_content(64 * 1024):
+            buf.write(chunk)
+            if buf.tell() > IMAGE_MAX_DOWNLOAD:
+                raise RuntimeError(f"Imagem grande demais: {src}")
+        return buf.getvalue()
+
+class _ImageCache:
+    """Arquivos em disco + downloads em andamento, compartilhados entre sessões."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fetching: set = set()
+        self.failed: Dict[str, float] = {}  # nome -> momento da falha (nova tentativa após IMAGE_RETRY_SEC)
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="img-proxy")
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(IMAGE_CACHE_DIR, name)
+
+    def fetch_later(self, src: str, width: int):
+        name = _name(src, width)
+        with self.lock:
+            if name in self.fetching or os.path.exists(self.path(name)):
+                return
+            if time.time() - self.failed.get(name, 0.0) < IMAGE_RETRY_SEC:
+                return
+            self.failed.pop(name, None)
+            self.fetching.add(name)
+        self.pool.submit(self._fetch, src, width, name)
+
+    def _fetch(self, src: str, width: int, name: str):
+        try:
+            with metrics.timed("images.download"):
+                data = _shrink(_download(src), width)
+            tmp = self.path(name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(name))
+            self.evict()
+        except Exception:
+            with self.lock:
+                self.failed[name] = time.time()
+        finally:
+            with self.lock:
+                self.fetching.discard(name)
+
+    def evict(self):
+        """Apaga os arquivos menos usados até o cache caber em IMAGE_CACHE_MAX_BYTES."""
+        with self.lock:
+            files = []
+            for entry in os.scandir(IMAGE_CACHE_DIR):
+                if entry.is_file() and entry.name.endswith(".jpg"):
+                    info = entry.stat()
+                    files.append((info.st_mtime, info.st_size, entry.path))
+            total = sum(f[1] for f in files)
+            for _, size, path in sorted(files):
+                if total <= IMAGE_CACHE_MAX_BYTES:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+@st.cache_resource(show_spinner=False)
+def _image_cache() -> _ImageCache:
+    return _ImageCache()
+
+def _is_remote(src: str) -> bool:
+    return src.startswith(("http://", "https://"))
+
+def proxied_url(src: str, width: int = IMAGE_MAX_WIDTH) -> str:
+    """URL local da imagem já reduzida; a original enquanto ela não estiver no cache."""
+    src = str(src or "").strip()
+    if not _is_remote(src):
+        return src
+    name = _name(src, width)
+    try:
+        os.utime(_image_cache().path(name))  # marca como recém-usada para o LRU
+    except OSError:
+        return src
+    return f"{IMAGE_STATIC_URL}/{name}"
+
+def prefetch(urls: Iterable[str], width: int = IMAGE_MAX_WIDTH):
+    """Agenda em segundo plano o download das imagens que ainda não estão no cache."""
+    cache = _image_cache()
+    for src in urls:
+        src = str(src or "").strip()
+        if _is_remote(src):
+            cache.fetch_later(src, width)
@@ -0,0 +1,246 @@
+import os
+import re
+import unicodedata
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from utils import metrics
+from utils.schemas import get_schema
+from utils.sheets import append_rows, flush_writes, read_df
+
+# Importação em massa (CSV/XLSX) de aniversariantes e notícias. O arquivo é lido em
+# lotes de IMPORT_CHUNK_ROWS linhas; cada lote é validado pelo schema da aba, tem as
+# duplicatas removidas (id ou chave natural, contra a aba e contra o próprio arquivo) e
+# vai para o fim da aba numa única escrita, em vez de regravar a aba por linha.
+
+IMPORT_CHUNK_ROWS = 500
+IMPORT_MAX_ERRORS = 50    # linhas inválidas listadas no relatório (as demais só contam)
+IMPORT_FLUSH_SEC = 30     # espera pelas gravações pendentes da aba antes de importar
+
+# aba -> colunas obrigatórias e chave natural usada para detectar duplicatas
+IMPORT_RULES: Dict[str, Dict] = {
+    "birthdays": {"required": ("name", "day", "month"), "key": "name"},
+    "news": {"required": ("title",), "key": "title"},
+}
+
+# cabeçalhos usuais das planilhas do RH/comunicação (normalizados) -> coluna do schema
+HEADER_ALIASES = {
+    "nome": "name", "colaborador": "name", "setor": "sector", "departamento": "sector",
+    "area": "sector", "dia": "day", "mes": "month", "foto": "photo_url", "foto_url": "photo_url",
+    "titulo": "title", "descricao": "description", "texto": "description", "imagem": "image_url",
+    "imagem_url": "image_url", "ativo": "is_active", "ordem": "order",
+}
+# colunas de data completa: viram day/month quando estes não vierem no arquivo
+DATE_HEADERS = {"data", "data_nascimento", "data_de_nascimento", "dt_nascimento", "nascimento",
+                "aniversario", "birth_date", "birthday", "date"}
+
+MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def _norm_header(h) -> str:
+    text = unicodedata.normalize("NFKD", str(h or "")).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+def _norm_key(v) -> str:
+    """Chave natural comparável: sem acentos, caixa ou espaços repetidos."""
+    text = unicodedata.normalize("NFKD", str(v or "")).encode("ascii", "ignore").decode()
+    return " ".join(text.casefold().split())
+
+def _cell(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date)):
+        return v.strftime("%Y-%m-%d")
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+def _rename(columns: List, headers: List[str]) -> List[str]:
+    out = []
+    for i, c in enumerate(columns):
+        n = _norm_header(c)
+        col = n if n in headers else "_date" if n in DATE_HEADERS else HEADER_ALIASES.get(n, "")
+        out.append(col if col and col not in out else f"_ignored_{i}")
+    return out
+
+def _csv_encoding_and_sep(head: bytes) -> Tuple[str, str]:
+    try:
+        text = head.decode("utf-8-sig")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3:  # não é só um caractere cortado no fim da amostra
+            text, encoding = head.decode("latin-1"), "latin-1"
+        else:
+            text, encoding = head[:e.start].decode("utf-8-sig"), "utf-8-sig"
+    first = text.splitlines()[0] if text else ""
+    return encoding, (";" if first.count(";") > first.count(",") else ",")
+
+def _size(file) -> int:
+    pos = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(pos)
+    return size or 1
+
+def iter_chunks(file, filename: str, headers: List[str],
+                chunk_rows: int = IMPORT_CHUNK_ROWS) -> Iterator[Tuple[pd.DataFrame, float]]:
+    """
+    Lê o arquivo em lotes de texto com as colunas já mapeadas para o schema; cada lote
+    traz `_line` (linha no arquivo) e vem com a fração aproximada já lida.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        yield from _iter_xlsx(file, headers, chunk_rows)
+    elif ext in (".csv", ".txt"):
+        yield from _iter_csv(file, headers, chunk_rows)
+    else:
+        raise RuntimeError(f"Formato não suportado: '{ext or filename}'. Envie um arquivo .csv ou .xlsx.")
+
+def _iter_csv(file, headers: List[str], chunk_rows: int):
+    size = _size(file)
+    head = file.read(64 * 1024)
+    encoding, sep = _csv_encoding_and_sep(head)
+    file.seek(0)
+    # o leitor do pandas consome o arquivo em blocos grandes: estima o total de linhas pela amostra
+    total = max(size * max(head.count(b"\n"), 1) / max(len(head), 1), 1)
+    line = 2  # linha 1 é o cabeçalho
+    try:
+        reader = pd.read_csv(file, sep=sep, dtype=str, keep_default_na=False, encoding=encoding,
+                             chunksize=chunk_rows, skip_blank_lines=True)
+        for chunk in reader:
+            chunk.columns = _rename(chunk.columns, headers)
+            chunk = chunk.apply(lambda s: s.str.strip())
+            chunk["_line"] = range(line, line + len(chunk))
+            line += len(chunk)
+            yield chunk, min((line - 2) / total, 0.99)
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise RuntimeError(f"Não foi possível ler o CSV perto da linha {line}: {e}") from e
+
+def _iter_xlsx(file, headers: List[str], chunk_rows: int):
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise RuntimeError("Importar .xlsx requer o pacote openpyxl (veja requirements.txt).") from e
+    try:
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise RuntimeError(f"Não foi possível abrir a planilha Excel: {e}") from e
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        columns = _rename(next(rows, ()), headers)
+        total = max((ws.max_row or 0) - 1, 1)
+        batch, line = [], 2
+        for r in rows:
+            values = [_cell(v) for v in r[:len(columns)]]
+            if any(values):
+                batch.append(values + [""] * (len(columns) - len(values)) + [line])
+            line += 1
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=columns + ["_line"]), min((line - 2) / total, 1.0)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns + ["_line"]), 1.0
+    finally:
+        wb.close()
+
+def _derive_dates(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Preenche day/month a partir da coluna de data completa (dd/mm/aaaa, aaaa-mm-dd, dd/mm)."""
+    if "_date" not in chunk.columns:
+        return chunk
+    raw = chunk["_date"]
+    iso = raw.str.match(r"^\d{4}-\d{1,2}-\d{1,2}")
+    parts = raw.str.extract(r"^(\d{1,2})[/.-](\d{1,2})")
+    iso_parts = raw.str.extract(r"^\d{4}-(\d{1,2})-(\d{1,2})")
+    day = parts[0].where(~iso, iso_parts[1])
+    month = parts[1].where(~iso, iso_parts[0])
+    for col, derived in (("day", day), ("month", month)):
+        current = chunk[col] if col in chunk.columns else pd.Series("", index=chunk.index)
+        chunk[col] = current.where(current != "", derived.fillna(""))
+    return chunk
+
+def _validate(name: str, chunk: pd.DataFrame) -> Tuple[pd.DataFrame, List[Tuple[int, str]]]:
+    """Lote tipado pelo schema + lista (linha, motivo) das linhas recusadas."""
+    schema = get_schema(name)
+    chunk = _derive_dates(chunk)
+    if "is_active" not in chunk.columns:
+        chunk["is_active"] = "TRUE"
+    chunk["is_active"] = chunk["is_active"].where(chunk["is_active"] != "", "TRUE")
+    typed = schema.coerce(chunk)
+    lines = chunk["_line"].tolist()
+
+    reasons = pd.Series("", index=typed.index)
+    for col in IMPORT_RULES[name]["required"]:
+        s = typed[col]
+        missing = s.isna() | (s.astype(str).str.strip() == "") if s.dtype == "string" else s.isna()
+        reasons = reasons.where(~missing | (reasons != ""), f"'{col}' vazio ou inválido")
+    if "day" in typed.columns and "month" in typed.columns:
+        day = typed["day"].astype("Float64")
+        month = typed["month"].astype("Float64")
+        limit = month.map(lambda m: MONTH_DAYS[int(m) - 1] if pd.notna(m) and 1 <= m <= 12 else 0)
+        bad = (month.notna() & ~month.between(1, 12)) | (day.notna() & ~day.between(1, limit))
+        reasons = reasons.where(~bad.fillna(False) | (reasons != ""), "data inexistente (dia/mês)")
+
+    ok = (reasons == "").to_numpy()
+    invalid = [(lines[i], reasons.iloc[i]) for i in range(len(lines)) if not ok[i]]
+    return typed[ok].reset_index(drop=True), invalid
+
+@metrics.instrument("importer.import_file")
+def import_file(name: str, file, filename: str,
+                progress: Optional[Callable[[float, str], None]] = None) -> Dict:
+    """
+    Importa o arquivo para o fim da aba `name` (birthdays ou news), lote a lote. Retorna o
+    relatório: read, imported, duplicates, invalid e errors (["linha N: motivo", ...]).
+    """
+    if name not in IMPORT_RULES:
+        raise RuntimeError(f"Importação não disponível para a aba '{name}'.")
+    if not flush_writes(IMPORT_FLUSH_SEC, name):
+        # a gravação pendente regravaria a aba inteira por cima das linhas importadas
+        raise RuntimeError("Há alterações desta aba ainda sendo salvas; tente importar de novo em instantes.")
+    schema = get_schema(name)
+    headers = schema.headers
+    key_col = IMPORT_RULES[name]["key"]
+
+    existing = read_df(name, headers)
+    seen_keys = set(existing[key_col].map(_norm_key))
+    ids = pd.to_numeric(existing["id"], errors="coerce").dropna()
+    seen_ids = set(ids.astype(int))
+    next_id = int(ids.max()) + 1 if len(ids) else 1
+    orders = pd.to_numeric(existing["order"], errors="coerce").dropna()
+    next_order = int(orders.max()) + 1 if len(orders) else 1
+
+    report = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    for chunk, done in iter_chunks(file, filename, headers):
+        report["read"] += len(chunk)
+        typed, invalid = _validate(name, chunk)
+        report["invalid"] += len(invalid)
+        room = IMPORT_MAX_ERRORS - len(report["errors"])
+        report["errors"] += [f"linha {line}: {reason}" for line, reason in invalid[:max(room, 0)]]
+
+        keep = []
+        for i, (row_id, key) in enumerate(zip(typed["id"], typed[key_col].map(_norm_key))):
+            if key in seen_keys or (pd.notna(row_id) and int(row_id) in seen_ids):
+                report["duplicates"] += 1
+                continue
+            seen_keys.add(key)
+            if pd.notna(row_id):
+                seen_ids.add(int(row_id))  # id repetido mais abaixo no próprio lote também é duplicata
+            keep.append(i)
+        typed = typed.iloc[keep].reset_index(drop=True)
+
+        if not typed.empty:
+            # ids gerados começam depois de todos os já vistos (aba e ids explícitos do arquivo)
+            next_id = max([next_id] + [i + 1 for i in seen_ids])
+            missing = typed["id"].isna()
+            typed.loc[missing, "id"] = range(next_id, next_id + int(missing.sum()))
+            seen_ids.update(typed["id"].astype(int))
+            next_id += int(missing.sum())
+            missing = typed["order"].isna()
+            typed.loc[missing, "order"] = range(next_order, next_order + int(missing.sum()))
+            next_order = max(next_order, int(typed["order"].max()) + 1)
+            append_rows(name, headers, typed)
+            report["imported"] += len(typed)
+        if progress:
+            progress(done, f"{report['read']} linhas lidas, {report['imported']} importadas")
+    return report
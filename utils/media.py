@@ -0,0 +1,155 @@
+import streamlit as st
+import pandas as pd
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from utils import http_client
+
+MEDIA_KINDS = ("youtube", "drive", "video", "iframe")
+VIDEO_EXTS = (".mp4", ".webm", ".ogg", ".m4v", ".mov")
+RESOLVER_TTL = 6 * 60 * 60  # validade da classificação obtida por HEAD
+HEAD_TIMEOUT = 8
+
+YOUTUBE_PATTERNS = [
+    r"(?:v=|/embed/|/shorts/|youtu\.be/)([A-Za-z0-9_-]{11})",
+]
+
+class Media(NamedTuple):
+    kind: str  # youtube | drive | video | iframe
+    ref: str   # id do YouTube/Drive ou a própria URL
+
+def extract_youtube_id(url: str) -> str | None:
+    u = str(url or "").strip()
+    if not u:
+        return None
+    for pat in YOUTUBE_PATTERNS:
+        m = re.search(pat, u)
+        if m:
+            return m.group(1)
+    try:
+        q = parse_qs(urlparse(u).query)
+        if "v" in q and len(q["v"]) > 0 and len(q["v"][0]) == 11:
+            return q["v"][0]
+    except Exception:
+        pass
+    return None
+
+def extract_drive_id(url: str) -> str | None:
+    u = str(url or "").strip()
+    if not u:
+        return None
+    m = re.search(r"/file/d/([A-Za-z0-9_-]+)", u)
+    if m:
+        return m.group(1)
+    try:
+        q = parse_qs(urlparse(u).query)
+        if "id" in q and len(q["id"]) > 0:
+            return q["id"][0]
+    except Exception:
+        pass
+    return None
+
+def classify_offline(url: str) -> Optional[Media]:
+    """Classifica só pela URL (sem rede). None quando só um HEAD poderia dizer."""
+    u = str(url or "").strip()
+    if "youtube.com" in u or "youtu.be" in u:
+        vid = extract_youtube_id(u)
+        if vid:
+            return Media("youtube", vid)
+    if "drive.google.com" in u:
+        fid = extract_drive_id(u)
+        if fid:
+            return Media("drive", fid)
+    if urlparse(u).path.lower().endswith(VIDEO_EXTS):
+        return Media("video", u)
+    return None
+
+def probe(url: str) -> Media:
+    """Classifica pelo content-type de um HEAD (vídeo direto ou iframe genérico)."""
+    u = str(url or "").strip()
+    ct = ""
+    try:
+        h = http_client.head(u, timeout=HEAD_TIMEOUT)
+        ct = (h.headers.get("content-type") or "").lower()
+    except Exception:
+        pass
+    return Media("video" if "video" in ct else "iframe", u)
+
+class _ResolverCache:
+    """Classificações obtidas por HEAD, com TTL, compartilhadas entre sessões."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Tuple[Media, float]] = {}
+        self.probing: set = set()
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="media-probe")
+
+    def get(self, url: str) -> Tuple[Optional[Media], bool]:
+        """(classificação em cache, se ainda está dentro do TTL)."""
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry is None:
+            return None, False
+        media, at = entry
+        return media, time.time() - at < RESOLVER_TTL
+
+    def store(self, url: str, media: Media):
+        with self.lock:
+            self.entries[url] = (media, time.time())
+            self.probing.discard(url)
+
+    def probe_later(self, url: str):
+        with self.lock:
+            if url in self.probing:
+                return
+            self.probing.add(url)
+        self.pool.submit(lambda: self.store(url, probe(url)))
+
+@st.cache_resource(show_spinner=False)
+def _resolver_cache() -> _ResolverCache:
+    return _ResolverCache()
+
+def resolve(url: str, blocking: bool = False) -> Media:
+    """
+    Tipo de embed da URL. YouTube/Drive/extensão de vídeo saem direto da URL; o resto
+    usa o cache de HEAD. Sem `blocking`, uma URL nunca vista vira iframe por enquanto e
+    o HEAD roda em segundo plano, então a renderização não faz I/O de rede.
+    """
+    u = str(url or "").strip()
+    media = classify_offline(u)
+    if media is not None or not u:
+        return media or Media("iframe", u)
+    cache = _resolver_cache()
+    media, fresh = cache.get(u)
+    if fresh:
+        return media
+    if blocking:
+        media = probe(u)
+        cache.store(u, media)
+        return media
+    cache.probe_later(u)
+    return media or Media("iframe", u)
+
+def annotate_videos(df: pd.DataFrame) -> pd.DataFrame:
+    """Preenche kind/embed_id de cada linha da aba videos (usado ao salvar no admin)."""
+    df = df.copy()
+    urls = df["url"].astype(str).tolist() if len(df) else []
+    resolved = list(_resolver_cache().pool.map(lambda u: resolve(u, blocking=True), urls))
+    df["kind"] = [m.kind for m in resolved]
+    df["embed_id"] = [m.ref if m.kind in ("youtube", "drive") else "" for m in resolved]
+    return df
+
+def media_of(url: str, kind: str = "", embed_id: str = "") -> Media:
+    """Classificação persistida na planilha, com fallback para o resolvedor."""
+    kind = str(kind or "").strip().lower()
+    embed_id = str(embed_id or "").strip()
+    u = str(url or "").strip()
+    if kind in ("youtube", "drive") and embed_id:
+        return Media(kind, embed_id)
+    if kind in ("video", "iframe") and u:
+        return Media(kind, u)
+    return resolve(u)
@@ -0,0 +1,193 @@
+import streamlit as st
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Instrumentação leve: por ponto de chamada ("sheets.batch_get", "http.api.coingecko.com",
+# "panel.news"...) guarda contagem, erros, acertos/faltas de cache e um histograma de
+# latência. Display e admin costumam ser processos separados, então cada processo grava
+# periodicamente seu retrato em METRICS_DIR e o admin junta todos na aba Diagnóstico.
+
+METRICS_DIR = os.environ.get(
+    "TV_METRICS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".metrics"),
+)
+METRICS_FLUSH_SEC = 15     # intervalo entre gravações do retrato do processo
+METRICS_MAX_AGE = 60 * 60  # retratos sem atualização há mais tempo são descartados
+HIST_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # + "acima"
+
+def _new_site() -> Dict:
+    return {"calls": 0, "errors": 0, "hits": 0, "misses": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "hist": [0] * (len(HIST_BOUNDS_MS) + 1), "last_error": None, "last_error_at": None}
+
+class _Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sites: Dict[str, Dict] = {}
+        self.label = "app"
+        self.states: Dict[str, Callable[[], Dict]] = {}  # retratos extras (ex.: circuitos do http_client)
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+        self.thread.start()
+
+    def _site(self, name: str) -> Dict:
+        site = self.sites.get(name)
+        if site is None:
+            site = self.sites[name] = _new_site()
+        return site
+
+    def record(self, name: str, ms: float, error: Optional[BaseException] = None):
+        bucket = next((i for i, b in enumerate(HIST_BOUNDS_MS) if ms <= b), len(HIST_BOUNDS_MS))
+        with self.lock:
+            site = self._site(name)
+            site["calls"] += 1
+            site["total_ms"] += ms
+            site["max_ms"] = max(site["max_ms"], ms)
+            site["hist"][bucket] += 1
+            if error is not None:
+                site["errors"] += 1
+                site["last_error"] = f"{type(error).__name__}: {error}"[:300]
+                site["last_error_at"] = time.time()
+
+    def cache(self, name: str, hit: bool):
+        with self.lock:
+            self._site(name)["hits" if hit else "misses"] += 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            sites = {name: dict(site, hist=list(site["hist"])) for name, site in self.sites.items()}
+        states = {}
+        for name, fn in list(self.states.items()):
+            try:
+                states[name] = fn()
+            except Exception:
+                continue  # diagnóstico nunca derruba a aplicação
+        return {"label": self.label, "pid": os.getpid(), "started_at": self.started_at,
+                "updated_at": time.time(), "sites": sites, "states": states}
+
+    def path(self) -> str:
+        return os.path.join(METRICS_DIR, f"{self.label}-{os.getpid()}.json")
+
+    def flush(self):
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            tmp = self.path() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, self.path())
+        except OSError:
+            pass  # diagnóstico nunca derruba a aplicação
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SEC)
+            if self.sites:
+                self.flush()
+
+@st.cache_resource(show_spinner=False)
+def _metrics() -> _Metrics:
+    return _Metrics()
+
+def set_label(label: str):
+    """Nome do processo nos retratos (ex.: "display", "admin")."""
+    m = _metrics()
+    if m.label != label:
+        try:
+            os.remove(m.path())
+        except OSError:
+            pass
+        m.label = label
+
+@contextmanager
+def timed(site: str):
+    """Mede o bloco em `site`; exceções contam como erro e seguem adiante."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        _metrics().record(site, (time.perf_counter() - t0) * 1000, e)
+        raise
+    _metrics().record(site, (time.perf_counter() - t0) * 1000)
+
+def instrument(site: str):
+    """Decorador equivalente a `with timed(site)` em volta da função."""
+    def decorator(fn: Callable):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(site):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def register_state(name: str, fn: Callable[[], Dict]):
+    """Inclui `fn()` (JSON) nos retratos do processo, em snap["states"][name]."""
+    _metrics().states[name] = fn
+
+def record(site: str, ms: float, error: Optional[BaseException] = None):
+    _metrics().record(site, ms, error)
+
+def cache_hit(site: str, hit: bool = True):
+    _metrics().cache(site, hit)
+
+def snapshot() -> Dict:
+    """Retrato do processo atual."""
+    return _metrics().snapshot()
+
+def load_all() -> List[Dict]:
+    """Retratos de todos os processos (o atual ao vivo + os gravados por outros)."""
+    current = _metrics()
+    current.flush()
+    out = [current.snapshot()]
+    now = time.time()
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        return out
+    for name in names:
+        path = os.path.join(METRICS_DIR, name)
+        if not name.endswith(".json") or path == current.path():
+            continue
+        try:
+            if now - os.path.getmtime(path) > METRICS_MAX_AGE:
+                os.remove(path)
+                continue
+            with open(path, encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+def percentile(hist: List[int], q: float) -> Optional[float]:
+    """Limite superior (ms) do balde que contém o percentil q (0-1) do histograma."""
+    total = sum(hist)
+    if not total:
+        return None
+    acc = 0
+    for i, n in enumerate(hist):
+        acc += n
+        if acc >= q * total:
+            return float(HIST_BOUNDS_MS[i]) if i < len(HIST_BOUNDS_MS) else float("inf")
+    return float("inf")
+
+def summary_rows(snap: Dict) -> List[Dict]:
+    """Linhas de tabela (uma por ponto de chamada) para exibir um retrato."""
+    rows = []
+    for name, s in sorted(snap.get("sites", {}).items()):
+        lookups = s["hits"] + s["misses"]
+        rows.append({
+            "ponto": name,
+            "chamadas": s["calls"],
+            "erros": s["errors"],
+            "erro %": round(100 * s["errors"] / s["calls"], 1) if s["calls"] else None,
+            "cache hit %": round(100 * s["hits"] / lookups, 1) if lookups else None,
+            "média ms": round(s["total_ms"] / s["calls"], 1) if s["calls"] else None,
+            "p50 ms": percentile(s["hist"], 0.5),
+            "p95 ms": percentile(s["hist"], 0.95),
+            "máx ms": round(s["max_ms"], 1),
+            "último erro": s["last_error"] or "",
+        })
+    return rows
@@ -0,0 +1,164 @@
+import streamlit.components.v1 as components
+import pandas as pd
+import json
+from html import escape
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+from utils.media import media_of
+
+# Componente de playlist: o navegador da TV gira os itens sozinho. O HTML gerado só
+# muda quando o conteúdo muda, então reruns do servidor não recarregam o iframe (nem
+# reiniciam vídeo, animações ou a rotação).
+
+BASE_CSS = """
+html, body { margin: 0; padding: 0; background: transparent; font-family: "Source Sans Pro", sans-serif; }
+.title { color: #e6f0ff; font-weight: 700; }
+.card { background: #11172a; border-radius: 16px; padding: 16px; box-shadow: 0 0 20px rgba(0,0,0,.2); }
+.text { color: #d7e3ff; }
+.text h3 { margin: 0 0 8px 0; }
+.muted { color: #a8b3cf; }
+img { border-radius: 12px; max-width: 100%; max-height: 100%; object-fit: cover; display: block; }
+.slide { height: 100%; display: flex; flex-direction: column; gap: 12px; animation: fade .6s ease-in; }
+.slide .media { flex: 1; min-height: 0; display: flex; align-items: center; justify-content: center; }
+@keyframes fade { from { opacity: 0; } to { opacity: 1; } }
+.embed { position: relative; width: 100%; height: 100%; overflow: hidden; border-radius: 12px; }
+.embed iframe, .embed video { position: absolute; top: 0; left: 0; width: 100%; height: 100%; border: 0; border-radius: 12px; background: #000; }
+.party { font-size: 28px; animation: pop 1.2s ease-in-out infinite alternate; }
+@keyframes pop { from { transform: scale(1); } to { transform: scale(1.25); } }
+.clocks { display: grid; grid-template-columns: 1fr 1fr; gap: 12px; }
+.clocks h4 { margin: 0 0 4px 0; }
+.ticker { white-space: nowrap; overflow: hidden; }
+.ticker > div { display: inline-block; padding-left: 100%; animation: scroll var(--dur, 30s) linear infinite; }
+@keyframes scroll { 0% { transform: translate(0,0);} 100% { transform: translate(-100%,0);} }
+"""
+
+# Índice calculado pelo relógio (epoch): telas diferentes mostram o mesmo item e a
+# rotação continua de onde estava mesmo se o iframe for recarregado.
+ROTATOR_JS = """
+const slides = %s;
+const slot = document.getElementById("slot");
+const total = slides.reduce((a, s) => a + s.ms, 0);
+let current = -1;
+function at(now) {
+  let t = now %% total;
+  for (let i = 0; i < slides.length; i++) {
+    if (t < slides[i].ms) return [i, slides[i].ms - t];
+    t -= slides[i].ms;
+  }
+  return [0, slides[0].ms];
+}
+function preload(s) { if (s && s.img) { const im = new Image(); im.src = s.img; } }
+function tick() {
+  const [i, left] = at(Date.now());
+  if (i !== current) {
+    current = i;
+    slot.innerHTML = slides[i].html;
+    preload(slides[(i + 1) %% slides.length]);
+  }
+  setTimeout(tick, Math.max(left, 50) + 20);
+}
+tick();
+"""
+
+CLOCKS_JS = """
+const clocks = %s;
+const fmts = clocks.map(c => {
+  try { return new Intl.DateTimeFormat("pt-BR", {hour: "2-digit", minute: "2-digit", timeZone: c.tz}); }
+  catch (e) { return null; }
+});
+function render() {
+  const now = new Date();
+  clocks.forEach((c, i) => {
+    document.getElementById("clk" + i).textContent = fmts[i] ? fmts[i].format(now) : "--:--";
+  });
+}
+render();
+setInterval(render, 1000);
+"""
+
+def _page(body: str, script: str = "") -> str:
+    return (f"<!doctype html><html><head><meta charset='utf-8'><style>{BASE_CSS}</style></head>"
+            f"<body>{body}<script>{script}</script></body></html>")
+
+def _text(v) -> str:
+    return "" if v is None or pd.isna(v) else escape(str(v).strip())
+
+def _script_json(value) -> str:
+    """JSON para embutir em <script>: "</" não pode fechar a tag antes da hora."""
+    return json.dumps(value, ensure_ascii=False).replace("</", "<\\/")
+
+def rotator(slides: Sequence[Mapping], height: int):
+    """Gira no navegador os slides [{"html", "ms", "img"?}] (cada um fica `ms` na tela)."""
+    payload = _script_json([dict(s) for s in slides])
+    body = "<div id='slot' style='height:%dpx'></div>" % (height - 8)
+    components.html(_page(body, ROTATOR_JS % payload), height=height)
+
+def clocks(items: Sequence[Mapping], height: Optional[int] = None):
+    """Relógios [{"label", "tz"}] que avançam sozinhos no navegador."""
+    cards = "".join(
+        f"<div class='card'><div class='text'><h4>{_text(c['label'])}</h4>"
+        f"<div id='clk{i}' class='title' style='font-size:42px'>--:--</div></div></div>"
+        for i, c in enumerate(items)
+    )
+    payload = _script_json([{"tz": str(c["tz"])} for c in items])
+    height = height or 120 * ((len(items) + 1) // 2)
+    components.html(_page(f"<div class='clocks'>{cards}</div>", CLOCKS_JS % payload), height=height)
+
+def ticker(text: str, height: int = 64):
+    """Faixa rolante; a animação só reinicia quando o texto muda."""
+    dur = max(20, len(text) // 6)
+    body = f"<div class='card ticker text' style='--dur:{dur}s'><div>{escape(text)}</div></div>"
+    components.html(_page(body), height=height)
+
+# === Slides ===
+def _img(v, src: Optional[Callable[[str], str]]) -> str:
+    """URL da imagem, opcionalmente trocada pela cópia local reduzida (utils.images)."""
+    url = "" if v is None or pd.isna(v) else str(v).strip()
+    return escape(src(url) if src and url else url)
+
+def news_slides(df: pd.DataFrame, ms: int, src: Optional[Callable[[str], str]] = None) -> List[Dict]:
+    out = []
+    for row in df.itertuples(index=False):
+        img = _img(row.image_url, src)
+        media = f"<div class='media'><img src='{img}'></div>" if img else ""
+        html = (f"<div class='slide'><div class='text'><h3>{_text(row.title)}</h3>"
+                f"<p class='muted'>{_text(row.description)}</p></div>{media}</div>")
+        out.append({"html": html, "ms": ms, "img": img})
+    return out
+
+def birthday_slides(df: pd.DataFrame, ms: int, src: Optional[Callable[[str], str]] = None) -> List[Dict]:
+    out = []
+    for row in df.itertuples(index=False):
+        img = _img(row.photo_url, src)
+        media = f"<div class='media'><img src='{img}'></div>" if img else ""
+        day = "" if pd.isna(row.day) else f"{int(row.day):02d}"
+        month = "" if pd.isna(row.month) else f"{int(row.month):02d}"
+        html = (f"<div class='slide'>{media}<div class='text'><span class='party'>🎉</span>"
+                f"<h3>{_text(row.name)}</h3><p class='muted'>{_text(row.sector)} • {day}/{month}</p></div></div>")
+        out.append({"html": html, "ms": ms, "img": img})
+    return out
+
+def video_html(url: str, kind: str = "", embed_id: str = "") -> str:
+    """Embed do vídeo pela classificação persistida: YouTube -> Drive -> MP4 -> iframe genérico."""
+    m = media_of(url, kind, embed_id)
+    if m.kind == "video":
+        return f"<div class='embed'><video src='{escape(m.ref)}' autoplay muted loop playsinline></video></div>"
+    if m.kind == "youtube":
+        src = f"https://www.youtube.com/embed/{escape(m.ref)}?autoplay=1&mute=1&controls=1&rel=0"
+        allow = "accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share"
+    elif m.kind == "drive":
+        src = f"https://drive.google.com/file/d/{escape(m.ref)}/preview"
+        allow = "autoplay"
+    else:
+        src = escape(m.ref)
+        allow = "autoplay; encrypted-media"
+    return f"<div class='embed'><iframe src='{src}' allow='{allow}' allowfullscreen></iframe></div>"
+
+def video_slides(df: pd.DataFrame, ms: int) -> List[Dict]:
+    out = []
+    for row in df.itertuples(index=False):
+        if not str(row.url or "").strip():
+            continue
+        dur = ms if pd.isna(row.duration_sec) or row.duration_sec <= 0 else int(row.duration_sec) * 1000
+        out.append({"html": f"<div class='slide'>{video_html(row.url, row.kind, row.embed_id)}</div>", "ms": dur})
+    return out
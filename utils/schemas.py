@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+# Valores aceitos como verdadeiro nas colunas booleanas
+TRUTHY = {"TRUE", "1", "YES", "SIM", "Y", "VERDADEIRO"}
+
+# tipo declarado -> dtype compacto do pandas
+KIND_DTYPES = {
+    "str": "string",
+    "url": "string",
+    "category": "category",
+    "bool": "bool",
+    "int": "Int32",
+    "int16": "Int16",
+    "float": "Float64",
+}
+NUMERIC_KINDS = ("int", "int16", "float")
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    kind: str = "str"  # str | url | category | bool | int | int16 | float
+
+@dataclass(frozen=True)
+class Schema:
+    name: str
+    columns: Tuple[Column, ...]
+
+    @property
+    def headers(self) -> List[str]:
+        return [c.name for c in self.columns]
+
+    def cols(self, *kinds: str) -> List[str]:
+        return [c.name for c in self.columns if c.kind in kinds]
+
+    def coerce(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converte as colunas (texto cru da planilha ou do editor) para os dtypes declarados.
+        Células numéricas que não convertem (id "n-1", order "1.5", int16 fora da faixa)
+        viram NA e ficam em attrs["invalid"] ({coluna: {posição: texto}}), para as
+        gravações não as apagarem sem aviso.
+        """
+        out = pd.DataFrame(index=df.index)
+        invalid: Dict[str, Dict[int, str]] = {}
+        for c in self.columns:
+            s = df[c.name] if c.name in df.columns else pd.Series("", index=df.index)
+            out[c.name] = typed = _coerce_series(s, c.kind)
+            if c.kind in NUMERIC_KINDS:
+                raw = _text(s)
+                bad = np.flatnonzero(((raw != "") & typed.isna()).to_numpy())
+                if len(bad):
+                    invalid[c.name] = {int(i): raw.iloc[i] for i in bad}
+        out = out.reset_index(drop=True)
+        out.attrs["invalid"] = invalid
+        return out
+
+    def editable(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Cópia para o st.data_editor: categorias viram texto livre."""
+        cats = self.cols("category")
+        return df.astype({c: "string" for c in cats}) if cats else df.copy()
+
+    def to_rows(self, df: pd.DataFrame) -> List[List[str]]:
+        """Serializa o DataFrame nas linhas de texto gravadas na planilha."""
+        typed = self.coerce(df)
+        if typed.attrs["invalid"]:
+            raise RuntimeError(f"Valores inválidos na aba '{self.name}': "
+                               f"{describe_invalid(typed.attrs['invalid'])}.")
+        cols = []
+        for c in self.columns:
+            s = typed[c.name]
+            if c.kind == "bool":
+                cols.append(s.map({True: "TRUE", False: "FALSE"}))
+            else:
+                cols.append(s.astype(object).where(s.notna(), "").astype(str))
+        if not cols:
+            return []
+        return [list(r) for r in zip(*cols)]
+
+def invalid_cells(df: pd.DataFrame) -> Dict[str, Dict[int, str]]:
+    """Células que não converteram na leitura ({coluna: {posição: texto}}; veja Schema.coerce)."""
+    return df.attrs.get("invalid") or {}
+
+def describe_invalid(invalid: Dict[str, Dict[int, str]], rows: List[int] = None, limit: int = 5) -> str:
+    """Lista legível das células (linha da planilha = posição + 2, ou `rows[posição]`)."""
+    cells = sorted((pos, col, text) for col, found in invalid.items() for pos, text in found.items())
+    parts = [f"linha {rows[pos] if rows is not None else pos + 2}, {col} = '{text}'"
+             for pos, col, text in cells[:limit]]
+    more = len(cells) - limit
+    return "; ".join(parts) + (f" e mais {more}" if more > 0 else "")
+
+def _text(s: pd.Series) -> pd.Series:
+    return s.astype(object).where(s.notna(), "").astype(str).str.strip()
+
+def _coerce_series(s: pd.Series, kind: str) -> pd.Series:
+    if kind == "bool":
+        if s.dtype == bool:
+            return s
+        return s.astype(str).str.strip().str.upper().isin(TRUTHY)
+    if kind in NUMERIC_KINDS:
+        num = pd.to_numeric(_text(s).str.replace(",", ".", regex=False), errors="coerce")
+        if kind == "float":
+            return num.astype("Float64")
+        info = (-2**15, 2**15 - 1) if kind == "int16" else (-2**31, 2**31 - 1)
+        num = num.where((num == num.round()) & num.between(*info))
+        return num.astype(KIND_DTYPES[kind])
+    return _text(s).astype(KIND_DTYPES.get(kind, "string"))
+
+def _schema(name: str, *cols) -> Schema:
+    return Schema(name, tuple(Column(*c) if isinstance(c, tuple) else Column(c) for c in cols))
+
+SCHEMAS: Dict[str, Schema] = {s.name: s for s in [
+    _schema("news", ("id", "int"), "title", "description", ("image_url", "url"),
+            ("is_active", "bool"), ("order", "int")),
+    _schema("birthdays", ("id", "int"), "name", ("sector", "category"), ("day", "int16"),
+            ("month", "int16"), ("photo_url", "url"), ("is_active", "bool"), ("order", "int")),
+    _schema("videos", ("id", "int"), "title", ("url", "url"), ("duration_sec", "int16"),
+            ("is_active", "bool"), ("order", "int"), ("kind", "category"), "embed_id"),
+    _schema("weather", ("id", "int"), "label", ("lat", "float"), ("lon", "float"),
+            ("is_active", "bool"), ("order", "int")),
+    _schema("clocks", ("id", "int"), "label", ("tz", "category"), ("is_active", "bool"), ("order", "int")),
+    _schema("settings", "key", "value"),
+    _schema("users", "username", "display_name", "password_hash", ("role", "category"),
+            ("can_news", "bool"), ("can_videos", "bool"), ("can_birthdays", "bool"),
+            ("can_weather", "bool"), ("can_rates", "bool"), ("can_clocks", "bool"),
+            ("can_users", "bool"), ("is_active", "bool")),
+]}
+
+def get_schema(name: str) -> Schema:
+    return SCHEMAS[name]
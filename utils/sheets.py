@@ -2,16 +2,50 @@ import streamlit as st
 import gspread
 from google.oauth2.service_account import Credentials
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional, Iterable, Mapping, NamedTuple, Tuple, Union
 from gspread.exceptions import WorksheetNotFound, APIError
+from gspread.utils import numericise_all, rowcol_to_a1
 import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils import metrics
+from utils.schemas import SCHEMAS, describe_invalid, invalid_cells
+from utils.storage import (ROW_COL, StorageBackend, active_rows, get_backend, index_of, rows_of,
+                           storage_backend)
 
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive",
 ]
 
-HEADER_CACHE: Dict[str, List[str]] = {}
+HEADER_CACHE: Dict[str, List[str]] = {}  # cabeçalhos já validados neste processo
+WS_CACHE: Dict[str, "gspread.Worksheet"] = {}
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+REVISION_CHECK_SEC = 5      # intervalo mínimo entre consultas de revisão ao Drive
+SNAPSHOT_FALLBACK_TTL = 30  # validade do snapshot quando a revisão não pode ser lida
+WRITE_DEBOUNCE_SEC = 1.5    # silêncio exigido antes de gravar as escritas enfileiradas
+WRITE_MAX_DELAY_SEC = 10    # atraso máximo de uma escrita enfileirada
+WRITE_RETRY_SEC = 10        # espera antes de repetir uma gravação que falhou
+WRITE_MAX_ATTEMPTS = 3
+
+# Governador de cota: a Service Account é uma só para todas as TVs e o admin, e o Sheets
+# limita as requisições por minuto por usuário. As chamadas passam por um balde de fichas,
+# em faixas de prioridade (gravações > admin > display), com backoff em 429/5xx.
+SHEETS_QUOTA_PER_MIN = 60   # requisições por minuto da Service Account (cota padrão do Sheets)
+SHEETS_BURST = 10           # fichas acumuláveis para rajadas curtas
+LANES = ("write", "admin", "display")  # ordem de prioridade
+LANE_WAIT_SEC = {"write": 30, "admin": 15, "display": 5}  # espera máxima por uma ficha
+LANE_RETRIES = {"write": 4, "admin": 2, "display": 1}     # o display prefere degradar para o cache
+GOVERNOR_BACKOFF = 1.0      # 1s, 2s, 4s, ... (com jitter) entre tentativas após 429/5xx
+GOVERNOR_BACKOFF_MAX = 32
+
+_CLIENT_OVERRIDE: Optional[Tuple[object, str]] = None  # (cliente, spreadsheet_id) de install_client
 
 @st.cache_resource(show_spinner=False)
 def get_gs_client():
@@ -77,8 +111,23 @@ def get_gs_client():
             "e se as APIs Sheets/Drive estão habilitadas no GCP."
         ) from e
 
+def install_client(client, spreadsheet_id: str = "offline"):
+    """
+    Usa `client` (ex.: utils.fake_sheets.FakeClient) no lugar do cliente gspread dos
+    Secrets, descartando planilha, abas e snapshots em cache. None volta ao normal.
+    """
+    global _CLIENT_OVERRIDE
+    _CLIENT_OVERRIDE = None if client is None else (client, spreadsheet_id)
+    get_spreadsheet.clear()
+    WS_CACHE.clear()
+    HEADER_CACHE.clear()
+    invalidate_cache()
+
 @st.cache_resource(show_spinner=False)
 def get_spreadsheet():
+    if _CLIENT_OVERRIDE is not None:
+        client, key = _CLIENT_OVERRIDE
+        return client.open_by_key(key)
     client = get_gs_client()
     try:
         return client.open_by_key(st.secrets["spreadsheet_id"])
@@ -90,10 +139,227 @@ def get_spreadsheet():
             "• Google Sheets API e Drive API estão habilitadas no projeto GCP"
         ) from e
 
+class _Snapshot(NamedTuple):
+    revision: Optional[str]
+    headers: List[str]
+    read_at: float
+    df: pd.DataFrame          # DataFrame tipado servido aos leitores
+    rows: List[List[str]]     # linhas de dados como estão na planilha (base do diff de escrita)
+
+class _SnapshotStore:
+    """Snapshots das abas compartilhados entre sessões, indexados pela revisão da planilha."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tabs: Dict[str, _Snapshot] = {}
+        self.last: Dict[str, _Snapshot] = {}      # último snapshot lido, para degradar sem cota
+        self.indexes: Dict[tuple, _Snapshot] = {} # (aba, colunas) -> só as colunas de índice
+        self.keys: Dict[tuple, "_KeyIndex"] = {}  # (aba, coluna chave) -> chave -> linha
+        self.write_lock = threading.Lock()        # gravações por linha (mantêm self.keys)
+        self.inflight: Dict[tuple, Future] = {}   # leituras em andamento, para coalescer
+        self.revision: Optional[str] = None
+        self.checked_at = 0.0
+        self.revision_lock = threading.Lock()     # uma consulta de revisão por vez
+
+    def get(self, name: str, headers: List[str], revision: Optional[str]) -> Optional[_Snapshot]:
+        with self.lock:
+            snap = self.tabs.get(name)
+        if snap is None or snap.headers != headers:
+            return None
+        return self._valid(snap, revision)
+
+    def get_index(self, name: str, columns: List[str], revision: Optional[str]) -> Optional[_Snapshot]:
+        with self.lock:
+            snap = self.indexes.get((name, tuple(columns)))
+        return self._valid(snap, revision) if snap is not None else None
+
+    def put_index(self, name: str, columns: List[str], snap: _Snapshot):
+        with self.lock:
+            self.indexes[(name, tuple(columns))] = snap
+
+    @staticmethod
+    def _valid(snap: _Snapshot, revision: Optional[str]) -> Optional[_Snapshot]:
+        if revision is None:
+            # sem revisão conhecida, vale apenas por um TTL curto
+            return snap if time.time() - snap.read_at < SNAPSHOT_FALLBACK_TTL else None
+        return snap if snap.revision == revision else None
+
+    def put(self, name: str, snap: _Snapshot):
+        with self.lock:
+            self.tabs[name] = snap
+            self.last[name] = snap
+
+    def last_good(self, name: str, headers: List[str]) -> Optional[_Snapshot]:
+        """Último snapshot da aba, mesmo vencido (fallback quando o Sheets não responde)."""
+        with self.lock:
+            snap = self.last.get(name)
+        return snap if snap is not None and snap.headers == headers else None
+
+    def invalidate(self, name: Optional[str] = None, keep_keys: bool = False):
+        with self.lock:
+            if name is None:
+                self.tabs.clear()
+                self.last.clear()
+                self.indexes.clear()
+                self.keys.clear()
+            else:
+                self.tabs.pop(name, None)
+                for key in [k for k in self.indexes if k[0] == name]:
+                    del self.indexes[key]
+                if not keep_keys:  # as gravações por linha mantêm os índices de chave no lugar
+                    self._drop_keys(name)
+            self.checked_at = 0.0
+
+    def drop_keys(self, name: str):
+        with self.lock:
+            self._drop_keys(name)
+
+    def _drop_keys(self, name: str):
+        for key in [k for k in self.keys if k[0] == name]:
+            del self.keys[key]
+
+@st.cache_resource(show_spinner=False)
+def _snapshot_store() -> _SnapshotStore:
+    return _SnapshotStore()
+
+class QuotaExhausted(RuntimeError):
+    """Sem ficha do governador dentro do prazo da faixa; a chamada nem foi feita."""
+
+class _Governor:
+    """Balde de fichas compartilhado pelo processo, com faixas de prioridade."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.tokens = float(SHEETS_BURST)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting = {lane: 0 for lane in LANES}
+
+    def _refill(self, now: float):
+        self.tokens = min(SHEETS_BURST, self.tokens + (now - self.updated) * SHEETS_QUOTA_PER_MIN / 60)
+        self.updated = now
+
+    def acquire(self, lane: str) -> bool:
+        """Espera uma ficha; faixas mais prioritárias com gente esperando passam na frente."""
+        rank = LANES.index(lane)
+        deadline = time.monotonic() + LANE_WAIT_SEC[lane]
+        with self.cond:
+            self.waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ahead = any(self.waiting[other] for other in LANES[:rank])
+                    if not ahead and now >= self.paused_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    if now >= deadline:
+                        return False
+                    wait = max(self.paused_until - now, (1 - self.tokens) * 60 / SHEETS_QUOTA_PER_MIN, 0.05)
+                    self.cond.wait(min(wait, deadline - now))
+            finally:
+                self.waiting[lane] -= 1
+                self.cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Após um 429, ninguém chama a API até o backoff passar."""
+        with self.cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+@st.cache_resource(show_spinner=False)
+def _governor() -> _Governor:
+    return _Governor()
+
+_lane: ContextVar = ContextVar("sheets_lane", default="display")
+
+def use_lane(lane: str):
+    """Faixa de prioridade das chamadas desta sessão/thread ("admin" no tv_admin)."""
+    _lane.set(lane)
+
+@contextmanager
+def lane(name: str):
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+def _status_code(e: APIError) -> Optional[int]:
+    code = getattr(e, "code", None)
+    if not isinstance(code, int) or code < 0:
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+def _retryable(e: APIError, idempotent: bool = True) -> bool:
+    code = _status_code(e)
+    return code is not None and (code == 429 or (idempotent and code >= 500))
+
+def _api(fn, *args, idempotent: bool = True, **kwargs):
+    """
+    Chamada ao Sheets pelo governador: ficha na faixa atual e backoff exponencial em
+    429/5xx. Com idempotent=False (delete_rows/add_rows) só o 429 é repetido: depois de
+    um 5xx a chamada pode ter sido aplicada, e repeti-la apagaria/criaria linhas a mais.
+    """
+    current = _lane.get()
+    gov = _governor()
+    retries = LANE_RETRIES[current]
+    for attempt in range(retries + 1):
+        t0 = time.perf_counter()
+        if not gov.acquire(current):
+            err = QuotaExhausted(f"Cota do Google Sheets esgotada (faixa '{current}'). Tente novamente em instantes.")
+            metrics.record(f"sheets.quota_wait.{current}", (time.perf_counter() - t0) * 1000, err)
+            raise err
+        metrics.record(f"sheets.quota_wait.{current}", (time.perf_counter() - t0) * 1000)
+        try:
+            return fn(*args, **kwargs)
+        except APIError as e:
+            if not _retryable(e, idempotent) or attempt == retries:
+                raise
+            delay = min(GOVERNOR_BACKOFF_MAX, GOVERNOR_BACKOFF * 2 ** attempt) * random.uniform(1, 1.5)
+            if _status_code(e) == 429:
+                gov.pause(delay)
+            metrics.record("sheets.backoff", delay * 1000, e)
+            time.sleep(delay)
+
+def _fetch_revision() -> Optional[str]:
+    """Lê version/modifiedTime da planilha no Drive (None se indisponível)."""
+    sh = get_spreadsheet()
+    http = getattr(sh.client, "http_client", sh.client)
+    try:
+        with metrics.timed("sheets.revision"):
+            r = http.request(
+                "get",
+                f"{DRIVE_FILES_URL}/{sh.id}",
+                params={"fields": "version,modifiedTime", "supportsAllDrives": True},
+            )
+            meta = r.json()
+    except Exception:
+        return None
+    return f"{meta.get('version')}@{meta.get('modifiedTime')}"
+
+def current_revision() -> Optional[str]:
+    """Revisão atual da planilha, consultada no máximo a cada REVISION_CHECK_SEC."""
+    store = _snapshot_store()
+    if time.time() - store.checked_at < REVISION_CHECK_SEC:
+        return store.revision
+    with store.revision_lock:
+        if time.time() - store.checked_at < REVISION_CHECK_SEC:
+            return store.revision  # outra sessão acabou de consultar
+        revision = _fetch_revision()
+        with store.lock:
+            store.revision = revision
+            store.checked_at = time.time()
+        return revision
+
+def invalidate_cache(name: Optional[str] = None):
+    """Descarta o snapshot de uma aba (ou de todas) e força nova checagem de revisão."""
+    _snapshot_store().invalidate(name)
+
 def _safe_get_header(ws) -> list:
     """Lê a linha 1 com tolerância (se vazia, retorna [])."""
     try:
-        rows = ws.get('1:1')  # [[col1, col2, ...]] ou []
+        rows = _api(ws.get, '1:1')  # [[col1, col2, ...]] ou []
         if rows and len(rows) > 0:
             return rows[0]
         return []
@@ -107,18 +373,24 @@ def _ensure_headers(ws, headers: List[str]):
     """Garante que a linha 1 contenha exatamente 'headers'."""
     existing = _safe_get_header(ws)
     if existing != headers:
-        ws.batch_clear(["1:1"])
-        ws.update("1:1", [headers])
+        _api(ws.batch_clear, ["1:1"])
+        _api(ws.update, "1:1", [headers])
 
 def get_ws(name: str, headers: List[str]):
-    """Abre ou cria a worksheet e garante o cabeçalho."""
+    """Abre ou cria a worksheet e garante o cabeçalho (validado uma vez por processo)."""
+    ws = WS_CACHE.get(name)
+    if ws is not None and HEADER_CACHE.get(name) == headers:
+        return ws
+
     sh = get_spreadsheet()
     try:
-        ws = sh.worksheet(name)
+        if ws is None:
+            ws = _api(sh.worksheet, name)
     except WorksheetNotFound:
-        ws = sh.add_worksheet(title=name, rows=1000, cols=max(10, len(headers)))
-        ws.update("1:1", [headers])
-        HEADER_CACHE[name] = headers
+        ws = _api(sh.add_worksheet, title=name, rows=1000, cols=max(10, len(headers)))
+        _api(ws.update, "1:1", [headers])
+        HEADER_CACHE[name] = list(headers)
+        WS_CACHE[name] = ws
         return ws
     except APIError as e:
         raise RuntimeError(
@@ -127,49 +399,844 @@ def get_ws(name: str, headers: List[str]):
         ) from e
 
     _ensure_headers(ws, headers)
-    HEADER_CACHE[name] = headers
+    HEADER_CACHE[name] = list(headers)
+    WS_CACHE[name] = ws
     return ws
 
-def read_df(name: str, headers: List[str]) -> pd.DataFrame:
-    ws = get_ws(name, headers)
+def _a1_tab(name: str) -> str:
+    """Nome da aba como intervalo A1 (a aba inteira)."""
+    return "'" + name.replace("'", "''") + "'"
+
+def _ensure_worksheets(sh, tabs: Dict[str, List[str]]):
+    """Cria (com cabeçalho) as abas que ainda não existem na planilha."""
     try:
-        values = ws.get_all_records()  # respeita a linha 1 como header
+        existing = {ws.title for ws in _api(sh.worksheets)}
     except APIError as e:
         raise RuntimeError(
-            f"Erro ao ler dados da aba '{name}'. "
-            "Se a planilha acabou de ser criada, abra o admin e salve ao menos uma vez para gerar as abas."
+            "Não foi possível listar as abas da planilha. "
+            "Cheque se a planilha está compartilhada como **Editor** com a Service Account."
         ) from e
+    for name, headers in tabs.items():
+        if name not in existing:
+            get_ws(name, headers)
+
+def _typed_schema(name: str, headers: List[str]):
+    """Schema registrado para a aba, se os headers pedidos forem os dele."""
+    schema = SCHEMAS.get(name)
+    return schema if schema is not None and schema.headers == list(headers) else None
+
+def _pad_rows(rows: List[list], width: int) -> List[List[str]]:
+    return [[str(v) for v in (list(r) + [""] * width)[:width]] for r in rows]
+
+def _values_to_df(name: str, headers: List[str], rows: List[List[str]]) -> pd.DataFrame:
+    """
+    Converte as linhas de dados (sem cabeçalho, já normalizadas) em DataFrame. Abas do
+    registro saem já tipadas (bool/Int/category); as demais seguem a conversão numérica
+    do get_all_records.
+    """
+    schema = _typed_schema(name, headers)
+    if schema is not None:
+        return schema.coerce(pd.DataFrame(rows, columns=headers, dtype=object))
+    records = [numericise_all(r, empty2zero=False, default_blank="") for r in rows]
+    return pd.DataFrame(records, columns=headers)
+
+def _to_values(name: str, headers: List[str], df: pd.DataFrame) -> List[List[str]]:
+    """Linhas de texto a gravar na planilha."""
+    schema = _typed_schema(name, headers)
+    if schema is not None:
+        return schema.to_rows(df)
+    df = df.reindex(columns=headers).astype(object)
+    return df.where(df.notna(), "").astype(str).values.tolist()
+
+def _resolve_tabs(tabs: Union[Mapping[str, List[str]], Iterable[str]]) -> Dict[str, List[str]]:
+    """Aceita {nome: headers} ou só os nomes (headers vêm do registro de schemas)."""
+    if isinstance(tabs, Mapping):
+        return {name: list(headers) for name, headers in tabs.items()}
+    return {name: SCHEMAS[name].headers for name in tabs}
+
+def _fetch_many(tabs: Dict[str, List[str]]) -> Dict[str, List[List[str]]]:
+    """Lê as linhas de dados de várias abas com um único values_batch_get."""
+    sh = get_spreadsheet()
+    names = list(tabs)
+    try:
+        with metrics.timed("sheets.batch_get"):
+            resp = _api(sh.values_batch_get, [_a1_tab(n) for n in names])
+    except APIError as e:
+        if _retryable(e):
+            raise RuntimeError(f"Google Sheets indisponível ao ler {', '.join(names)} (HTTP {_status_code(e)}).") from e
+        # provavelmente alguma aba ainda não existe: cria e tenta de novo
+        _ensure_worksheets(sh, tabs)
+        try:
+            with metrics.timed("sheets.batch_get"):
+                resp = _api(sh.values_batch_get, [_a1_tab(n) for n in names])
+        except APIError as e:
+            raise RuntimeError(
+                f"Erro ao ler dados das abas {', '.join(names)}. "
+                "Se a planilha acabou de ser criada, abra o admin e salve ao menos uma vez para gerar as abas."
+            ) from e
+
+    out = {}
+    for name, vr in zip(names, resp.get("valueRanges", [])):
+        headers = tabs[name]
+        values = vr.get("values", [])
+        if HEADER_CACHE.get(name) != headers:
+            if (values[0] if values else []) == headers:
+                HEADER_CACHE[name] = list(headers)
+            else:
+                get_ws(name, headers)  # corrige a linha 1
+        out[name] = _pad_rows(values[1:], len(headers))
+    return out
+
+def _refresh(tabs: Dict[str, List[str]], revision: Optional[str]) -> Dict[str, _Snapshot]:
+    """
+    Relê as abas e guarda os snapshots. Sessões que pedem as mesmas abas enquanto a
+    leitura está em andamento esperam por ela em vez de fazer outra chamada.
+    """
+    store = _snapshot_store()
+    key = (revision,) + tuple(sorted((name, tuple(headers)) for name, headers in tabs.items()))
+    with store.lock:
+        fut = store.inflight.get(key)
+        leader = fut is None
+        if leader:
+            fut = store.inflight[key] = Future()
+    metrics.cache_hit("sheets.coalesced", not leader)
+    if not leader:
+        return fut.result()
+    try:
+        out = {}
+        for name, rows in _fetch_many(tabs).items():
+            headers = tabs[name]
+            snap = _Snapshot(revision, headers, time.time(), _values_to_df(name, headers, rows), rows)
+            store.put(name, snap)
+            out[name] = snap
+        fut.set_result(out)
+        return out
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with store.lock:
+            store.inflight.pop(key, None)
 
-    df = pd.DataFrame(values)
-    # garante colunas esperadas
-    for h in headers:
-        if h not in df.columns:
-            df[h] = None
-    return df[headers] if headers else df
+def _snapshots(tabs: Dict[str, List[str]], degrade: bool = True) -> Dict[str, _Snapshot]:
+    """
+    Snapshots válidos na revisão atual; as abas vencidas são relidas juntas. Se a leitura
+    falhar (cota, 5xx), `degrade` serve o último snapshot conhecido em vez de levantar.
+    """
+    store = _snapshot_store()
+    revision = current_revision()
+    out: Dict[str, _Snapshot] = {}
+    stale: Dict[str, List[str]] = {}
+    for name, headers in tabs.items():
+        snap = store.get(name, headers, revision)
+        metrics.cache_hit("sheets.snapshot", snap is not None)
+        if snap is None:
+            stale[name] = headers
+        else:
+            out[name] = snap
+    if stale:
+        try:
+            out.update(_refresh(stale, revision))
+        except Exception as e:
+            fallback = {name: store.last_good(name, headers) for name, headers in stale.items()}
+            if not degrade or any(snap is None for snap in fallback.values()):
+                raise
+            metrics.record("sheets.degraded", 0.0, e)
+            out.update(fallback)
+    return out
+
+@metrics.instrument("sheets.read_many")
+def read_many(tabs: Union[Mapping[str, List[str]], Iterable[str]]) -> Dict[str, pd.DataFrame]:
+    """
+    Lê várias abas ({nome: headers} ou lista de nomes do registro) de uma vez pelo backend
+    configurado (utils.storage). Abas com gravação ainda na fila saem da própria fila.
+    """
+    tabs = _resolve_tabs(tabs)
+    queue = _write_queue()
+    out = {name: queue.peek(name, headers) for name, headers in tabs.items()}
+    unsaved = {name: headers for name, headers in tabs.items() if out[name] is None}
+    if unsaved:
+        out.update(get_backend().read_many(unsaved))
+    return {name: out[name].copy() for name in tabs}
+
+def read_df(name: str, headers: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lê a aba como DataFrame, servindo o snapshot em memória enquanto a revisão não mudar."""
+    headers = headers or SCHEMAS[name].headers
+    return read_many({name: headers})[name]
+
+def read_active(tabs: Union[Mapping[str, List[str]], Iterable[str]],
+                full: Union[Mapping[str, List[str]], Iterable[str]] = ()) -> Dict[str, pd.DataFrame]:
+    """
+    Como read_many, mas só as linhas com is_active, ordenadas por order (no SQLite, uma
+    consulta pelos índices dessas colunas em vez da tabela inteira). As abas de `full`
+    vêm inteiras na mesma leitura (no Sheets, tudo num único values_batch_get).
+    """
+    tabs, full = _resolve_tabs(tabs), _resolve_tabs(full)
+    queue = _write_queue()
+    out = {}
+    for name, headers in {**full, **tabs}.items():
+        pending = queue.peek(name, headers)
+        if pending is not None:
+            out[name] = pending if name in full else active_rows(pending)
+    saved = {name: headers for name, headers in tabs.items() if name not in out}
+    saved_full = {name: headers for name, headers in full.items() if name not in out}
+    if saved or saved_full:
+        out.update(get_backend().read_active(saved, saved_full))
+    return {name: out[name].copy() for name in [*full, *tabs]}
+
+def _col_letter(col: int) -> str:
+    return rowcol_to_a1(1, col)[:-1]
+
+def _runs(rows: Iterable[int]) -> List[Tuple[int, int]]:
+    """Linhas agrupadas em trechos contíguos (início, fim), em ordem crescente."""
+    runs: List[List[int]] = []
+    for r in sorted({int(r) for r in rows}):
+        if runs and runs[-1][1] == r - 1:
+            runs[-1][1] = r
+        else:
+            runs.append([r, r])
+    return [(r0, r1) for r0, r1 in runs]
+
+def _batch_get_ranges(name: str, ranges: List[str]) -> List[List[list]]:
+    """Valores de vários intervalos da aba num único values_batch_get."""
+    try:
+        with metrics.timed("sheets.batch_get"):
+            resp = _api(get_spreadsheet().values_batch_get, ranges)
+    except APIError as e:
+        raise RuntimeError(f"Erro ao ler intervalos da aba '{name}' (HTTP {_status_code(e)}).") from e
+    return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+
+def _read_columns(name: str, headers: List[str], columns: List[str]) -> List[List[str]]:
+    """
+    Texto cru das colunas pedidas (da linha 2 em diante), um intervalo por coluna, todas
+    com o número de linhas da aba inteira: a API apara cada coluna na sua última célula
+    preenchida, então as linhas abaixo disso (com dados só em outras colunas) são
+    contadas numa segunda leitura, de largura total, a partir desse ponto.
+    """
+    get_ws(name, headers)  # cria a aba/valida o cabeçalho (uma vez por processo)
+    ranges = []
+    for c in columns:
+        letter = _col_letter(headers.index(c) + 1)
+        ranges.append(f"{_a1_tab(name)}!{letter}2:{letter}")
+    cols = [[(str(r[0]) if r else "") for r in values] for values in _batch_get_ranges(name, ranges)]
+    n = max((len(c) for c in cols), default=0)
+    tail = _batch_get_ranges(name, [f"{_a1_tab(name)}!A{n + 2}:{_col_letter(len(headers))}"])
+    n += len(tail[0]) if tail else 0
+    return [c + [""] * (n - len(c)) for c in cols]
+
+def _read_index(name: str, headers: List[str], columns: List[str]) -> pd.DataFrame:
+    """
+    Colunas de índice de todas as linhas: do snapshot da aba, se estiver em dia, ou lidas
+    só elas (um intervalo por coluna) e guardadas por revisão.
+    """
+    store = _snapshot_store()
+    revision = current_revision()
+    snap = store.get(name, headers, revision)
+    if snap is not None:
+        return index_of(snap.df, columns)
+    cached = store.get_index(name, columns, revision)
+    metrics.cache_hit("sheets.index", cached is not None)
+    if cached is not None:
+        return cached.df
+    cols = _read_columns(name, headers, columns)
+    n = len(cols[0]) if cols else 0
+    frame = pd.DataFrame({h: [""] * n for h in headers}, dtype=object)
+    for c, values in zip(columns, cols):
+        frame[c] = values
+    schema = _typed_schema(name, headers)
+    df = index_of(schema.coerce(frame) if schema is not None else frame, columns)
+    store.put_index(name, columns, _Snapshot(revision, list(columns), time.time(), df, []))
+    return df
+
+def _read_rows(name: str, headers: List[str], rows: List[int]) -> pd.DataFrame:
+    """Só as linhas pedidas, lidas em trechos contíguos (A{ini}:{últ}{fim}) numa chamada."""
+    snap = _snapshot_store().get(name, headers, current_revision())
+    if snap is not None:
+        return rows_of(snap.df, rows)
+    runs = _runs(rows)
+    found: Dict[int, List[str]] = {}
+    if runs:
+        get_ws(name, headers)
+        last = _col_letter(len(headers))
+        ranges = [f"{_a1_tab(name)}!A{r0}:{last}{r1}" for r0, r1 in runs]
+        for (r0, r1), values in zip(runs, _batch_get_ranges(name, ranges)):
+            for i, row in enumerate(_pad_rows(values, len(headers))):
+                found[r0 + i] = row
+    keep = [int(r) for r in rows if int(r) in found]
+    df = _values_to_df(name, headers, [found[r] for r in keep])
+    df[ROW_COL] = keep
+    return df
+
+def read_index(name: str, columns: List[str], headers: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Só as colunas `columns` de todas as linhas, mais _row (identificador da linha para
+    read_rows/write_rows). Serve para filtrar e paginar sem trazer a aba inteira.
+    """
+    headers = headers or SCHEMAS[name].headers
+    pending = _write_queue().peek(name, headers)
+    if pending is not None:
+        return index_of(pending, columns)
+    return get_backend().read_index(name, headers, list(columns)).copy()
 
+def read_rows(name: str, rows: List[int], headers: Optional[List[str]] = None) -> pd.DataFrame:
+    """Só as linhas com os _row dados (ex.: uma página do read_index), com a coluna _row."""
+    headers = headers or SCHEMAS[name].headers
+    pending = _write_queue().peek(name, headers)
+    if pending is not None:
+        return rows_of(pending, rows)
+    return get_backend().read_rows(name, headers, list(rows)).copy()
+
+def storage_revision() -> Optional[str]:
+    """Revisão dos dados no backend configurado (muda a cada gravação)."""
+    return get_backend().revision()
+
+def _diff_rows(old: List[List[str]], new: List[List[str]]) -> List[Dict]:
+    """
+    Intervalos (A1 + valores) das células alteradas nas linhas presentes nas duas versões.
+    Trechos contíguos de colunas alteradas viram um intervalo por linha, e intervalos com
+    as mesmas colunas em linhas consecutivas são fundidos num bloco só.
+    """
+    blocks: List[list] = []  # [linha_ini, linha_fim, col_ini, col_fim, valores]
+    for i in range(min(len(old), len(new))):
+        a, b = old[i], new[i]
+        if a == b:
+            continue
+        r = i + 2  # linha 1 é o cabeçalho
+        c = 0
+        while c < len(b):
+            if a[c] == b[c]:
+                c += 1
+                continue
+            start = c
+            while c < len(b) and a[c] != b[c]:
+                c += 1
+            last = blocks[-1] if blocks else None
+            if last and last[1] == r - 1 and last[2] == start and last[3] == c - 1:
+                last[1] = r
+                last[4].append(b[start:c])
+            else:
+                blocks.append([r, r, start, c - 1, [b[start:c]]])
+    return [
+        {"range": f"{rowcol_to_a1(r0, c0 + 1)}:{rowcol_to_a1(r1, c1 + 1)}", "values": values}
+        for r0, r1, c0, c1, values in blocks
+    ]
+
+@metrics.instrument("sheets.write_df")
 def write_df(name: str, headers: List[str], df: pd.DataFrame):
+    """Grava o DataFrame inteiro na aba pelo backend configurado."""
+    backend = get_backend()
+    current = backend.read_many({name: headers})[name]
+    if invalid_cells(current):
+        _guard_invalid(name, headers, current, _to_values(name, headers, df) if not df.empty else [])
+    backend.write_df(name, headers, df)
+
+def _guard_invalid(name: str, headers: List[str], current: pd.DataFrame, new: List[List[str]]):
+    """
+    Recusa a gravação que apagaria células que a leitura não conseguiu converter (no
+    DataFrame elas são só NA). Por coluna: a versão nova não pode ter mais células vazias
+    do que a atual tem vazias de fato; consertar a célula no editor libera a gravação.
+    """
+    lost = {}
+    for col, found in invalid_cells(current).items():
+        c = headers.index(col)
+        blank = int(current[col].isna().sum()) - len(found)
+        if sum(1 for r in new if r[c] == "") > blank:
+            lost[col] = found
+    if lost:
+        raise RuntimeError(
+            f"A aba '{name}' tem valores que não são números válidos ({describe_invalid(lost)}). "
+            "Corrija-os na planilha antes de salvar por aqui, para eles não serem apagados."
+        )
+
+def _same_rows(headers: List[str], old: List[List[str]], new: List[List[str]]) -> bool:
+    """As duas versões têm as mesmas linhas nas mesmas posições (mesma contagem e ids)?"""
+    if len(old) != len(new):
+        return False
+    if "id" not in headers:
+        return True
+    c = headers.index("id")
+    return all(a[c] == b[c] for a, b in zip(old, new))
+
+def _write_df(name: str, headers: List[str], df: pd.DataFrame):
+    """
+    Grava o DataFrame na aba enviando só o que mudou em relação à aba relida na hora:
+    células alteradas e linhas novas num único batch_update, e linhas excedentes removidas
+    com delete_rows. Se as linhas não batem com as da aba (inclusão, exclusão ou outra
+    edição no meio), todas as linhas são regravadas em vez de só as células diferentes.
+    A aba nunca fica vazia durante a gravação.
+    """
     ws = get_ws(name, headers)
+    # base do diff precisa ser a versão atual da aba: nem o snapshot em memória (pode ter
+    # até REVISION_CHECK_SEC) serve, senão o diff posicional grava células nas linhas erradas
+    old = _fetch_many({name: list(headers)})[name]
+    new = _to_values(name, headers, df) if not df.empty else []
+    same = _same_rows(headers, old, new)
     try:
-        ws.clear()
-        ws.update("1:1", [headers])
-        if not df.empty:
-            data = df.fillna("").astype(str).values.tolist()
-            ws.update("A2", data)
+        updates = _diff_rows(old, new) if same else []
+        if len(new) > len(old) or (new and not same):
+            first = len(old) + 2 if same else 2
+            last = len(new) + 1
+            if last > ws.row_count:
+                _api(ws.add_rows, last - ws.row_count, idempotent=False)
+            updates.append({
+                "range": f"{rowcol_to_a1(first, 1)}:{rowcol_to_a1(last, len(headers))}",
+                "values": new[first - 2:],
+            })
+        if updates:
+            _api(ws.batch_update, updates)
+        if len(new) < len(old):
+            _api(ws.delete_rows, len(new) + 2, len(old) + 1, idempotent=False)
     except APIError as e:
         raise RuntimeError(
             f"Erro ao escrever na aba '{name}'. "
             "Verifique permissões e se não há proteção de intervalo bloqueando escrita."
         ) from e
+    finally:
+        invalidate_cache(name)
+
+def _key_text(v) -> str:
+    """Chave como fica gravada na planilha (12, 12.0 e "12" viram "12")."""
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+class _KeyIndex:
+    """
+    Chave -> linha da planilha de uma aba. `values` é a coluna chave com uma posição por
+    linha de dados da aba (contadas em largura total), então last_row é a última linha
+    ocupada mesmo quando a chave está vazia no fim da aba. As gravações por linha deste
+    processo o mantêm no lugar; antes de cada uma, _verify confere a linha alvo na aba.
+    """
+
+    def __init__(self, values: List[str]):
+        self.rows: Dict[str, int] = {}
+        for i, v in enumerate(values):
+            if v != "":
+                self.rows.setdefault(v, i + 2)  # chave repetida: vale a primeira, como no scan
+        self.last_row = len(values) + 1
+        nums = pd.to_numeric(pd.Series(list(self.rows), dtype=object), errors="coerce").dropna()
+        self.max_num = int(nums.max()) if len(nums) else 0
+        self.built_at = time.time()
+
+    def set(self, row: int, key: str):
+        """Linha gravada: a chave antiga dela sai do índice e a nova entra."""
+        self.rows = {k: r for k, r in self.rows.items() if r != row}
+        if key:
+            self.rows.setdefault(key, row)
+            if key.lstrip("-").isdigit():
+                self.max_num = max(self.max_num, int(key))
+        self.last_row = max(self.last_row, row)
+
+    def remove(self, row: int):
+        """Linha apagada: as de baixo sobem uma posição."""
+        self.rows = {k: (r - 1 if r > row else r) for k, r in self.rows.items() if r != row}
+        self.last_row -= 1
+
+def _key_index(name: str, headers: List[str], key_col: str, fresh: bool = False) -> _KeyIndex:
+    """Índice da coluna chave: o mantido em memória ou, se não houver (ou fresh), relido."""
+    store = _snapshot_store()
+    with store.lock:
+        index = None if fresh else store.keys.get((name, key_col))
+    metrics.cache_hit("sheets.key_index", index is not None)
+    if index is not None:
+        return index
+    snap = None if fresh else store.get(name, headers, current_revision())
+    if snap is not None:
+        col = headers.index(key_col)
+        values = [r[col] for r in snap.rows]
+    else:
+        values = _read_columns(name, headers, [key_col])[0]  # já com as linhas sem chave no fim
+    index = _KeyIndex(values)
+    with store.lock:
+        store.keys[(name, key_col)] = index
+    return index
+
+def _verify(name: str, headers: List[str], index: _KeyIndex, key_col: str, key: str,
+            target: Optional[int]) -> bool:
+    """
+    Confere numa leitura se o índice ainda vale para a aba (outro processo ou alguém na
+    planilha pode ter mexido nela): a chave está na linha alvo ou, para um insert, a
+    última linha do índice é de fato a última ocupada.
+    """
+    tab = _a1_tab(name)
+    if target is not None:
+        letter = _col_letter(headers.index(key_col) + 1)
+        values = _batch_get_ranges(name, [f"{tab}!{letter}{target}"])[0]
+        return _key_text(values[0][0] if values and values[0] else "") == key
+    last = index.last_row
+    values = _batch_get_ranges(name, [f"{tab}!A{max(last, 2)}:{_col_letter(len(headers))}{last + 1}"])[0]
+    if last < 2:
+        return not values
+    return len(values) == 1 and any(str(v).strip() for v in values[0])
+
+def _locate(name: str, headers: List[str], key_col: str, key: str) -> Tuple[_KeyIndex, Optional[int]]:
+    """Índice e linha da chave (None = não existe), conferidos na aba; relê o índice se preciso."""
+    store = _snapshot_store()
+    with store.lock:
+        kept = store.keys.get((name, key_col))
+    index = kept or _key_index(name, headers, key_col)
+    target = index.rows.get(key) if key else None
+    if kept is None:
+        return index, target  # acabou de ser lido
+    # chave ausente num índice mantido: pode ter sido gravada por fora, então relê
+    if (target is not None or not key) and _verify(name, headers, index, key_col, key, target):
+        return index, target
+    metrics.cache_hit("sheets.key_index_verify", False)
+    store.drop_keys(name)
+    index = _key_index(name, headers, key_col, fresh=True)
+    return index, index.rows.get(key) if key else None
+
+def _keys_after_write(name: str, apply):
+    """Aplica `apply(coluna, índice)` aos índices mantidos da aba e descarta os snapshots."""
+    store = _snapshot_store()
+    with store.lock:
+        for (tab, col), index in store.keys.items():
+            if tab == name:
+                apply(col, index)
+    store.invalidate(name, keep_keys=True)
+
+def _cell_ranges(row: int, cols: List[int], values: List[str]) -> List[Dict]:
+    """Intervalos de uma linha só com as colunas dadas (trechos contíguos viram um intervalo)."""
+    return [
+        {"range": f"{rowcol_to_a1(row, c0)}:{rowcol_to_a1(row, c1)}", "values": [values[c0 - 1:c1]]}
+        for c0, c1 in _runs(cols)
+    ]
+
+def _upsert_row(name: str, headers: List[str], row: Dict, key_col: str) -> Dict:
+    """
+    Update grava só as células informadas da linha achada pelo índice; insert grava uma
+    linha depois da última. Fora a conferência da linha alvo (uma leitura de poucas
+    células), nenhum dos dois lê a aba nem mexe na ordem física das linhas (a ordem de
+    exibição vem da coluna order na leitura).
+    """
+    ws = get_ws(name, headers)
+    store = _snapshot_store()
+    with store.write_lock:
+        # sem coluna chave, o índice da primeira coluna serve só para achar a última linha
+        col = key_col if key_col in headers else headers[0]
+        key = _key_text(row.get(key_col)) if key_col in headers else ""
+        index, target = _locate(name, headers, col, key)
+        if not key and "id" in headers:
+            # gera próximo id
+            ids = index if col == "id" else _key_index(name, headers, "id")
+            row["id"] = ids.max_num + 1
+        values = _to_values(name, headers, pd.DataFrame([{h: row.get(h) for h in headers}]))[0]
+        written = dict(zip(headers, values))
+        try:
+            if target is not None:
+                data = _cell_ranges(target, [i + 1 for i, h in enumerate(headers) if h in row], values)
+            else:
+                target = index.last_row + 1
+                if target > ws.row_count:
+                    _api(ws.add_rows, target - ws.row_count, idempotent=False)
+                data = _cell_ranges(target, list(range(1, len(headers) + 1)), values)
+            if data:
+                _api(ws.batch_update, data)
+        except APIError as e:
+            invalidate_cache(name)
+            raise RuntimeError(
+                f"Erro ao escrever na aba '{name}'. "
+                "Verifique permissões e se não há proteção de intervalo bloqueando escrita."
+            ) from e
+        inserted = target > index.last_row
+
+        def apply(c: str, idx: _KeyIndex):
+            if inserted or c in row:
+                idx.set(target, written.get(c, ""))
+        _keys_after_write(name, apply)
+    return row
+
+def _delete_row(name: str, headers: List[str], key, key_col: str) -> bool:
+    """Apaga a linha achada pelo índice (conferida na aba) com um único delete_rows."""
+    ws = get_ws(name, headers)
+    store = _snapshot_store()
+    with store.write_lock:
+        _, target = _locate(name, headers, key_col, _key_text(key))
+        if target is None:
+            return False
+        try:
+            _api(ws.delete_rows, target, idempotent=False)
+        except APIError as e:
+            invalidate_cache(name)
+            raise RuntimeError(
+                f"Erro ao apagar a linha '{key}' da aba '{name}'. "
+                "Verifique permissões e se não há proteção de intervalo bloqueando escrita."
+            ) from e
+        _keys_after_write(name, lambda c, idx: idx.remove(target))
+    return True
+
+def _write_rows(name: str, headers: List[str], df: pd.DataFrame, deleted: List[int]):
+    """
+    Linhas com _row são regravadas no lugar e as novas vão depois da última linha, tudo
+    num único batch_update; as removidas saem com delete_rows, de baixo para cima para
+    os números das linhas acima continuarem valendo.
+    """
+    ws = get_ws(name, headers)
+    rows = df[ROW_COL] if ROW_COL in df.columns else pd.Series(pd.NA, index=df.index)
+    values = _to_values(name, headers, df.reindex(columns=headers)) if not df.empty else []
+    updates = [
+        {"range": f"{rowcol_to_a1(int(r), 1)}:{rowcol_to_a1(int(r), len(headers))}", "values": [v]}
+        for r, v in zip(rows, values) if pd.notna(r)
+    ]
+    new = [v for r, v in zip(rows, values) if pd.isna(r)]
+    try:
+        if new:
+            # uma linha depois da última com qualquer coluna preenchida
+            first = len(_read_index(name, headers, headers[:1])) + 2
+            last = first + len(new) - 1
+            if last > ws.row_count:
+                _api(ws.add_rows, last - ws.row_count, idempotent=False)
+            updates.append({
+                "range": f"{rowcol_to_a1(first, 1)}:{rowcol_to_a1(last, len(headers))}",
+                "values": new,
+            })
+        if updates:
+            _api(ws.batch_update, updates)
+        for r0, r1 in reversed(_runs(deleted)):
+            _api(ws.delete_rows, r0, r1, idempotent=False)
+    except APIError as e:
+        raise RuntimeError(
+            f"Erro ao escrever na aba '{name}'. "
+            "Verifique permissões e se não há proteção de intervalo bloqueando escrita."
+        ) from e
+    finally:
+        invalidate_cache(name)
+
+def _append_rows(name: str, headers: List[str], df: pd.DataFrame):
+    """
+    Acrescenta as linhas no fim da aba com um único batch_update e estende o snapshot em
+    memória, para lotes seguidos (importação) não relerem a aba inteira a cada lote. O
+    snapshot mantém a revisão antiga e é descartado na próxima checagem de revisão.
+    """
+    ws = get_ws(name, headers)
+    snap = _snapshots({name: list(headers)}, degrade=False)[name]
+    new = _to_values(name, headers, df) if not df.empty else []
+    if not new:
+        return
+    first = len(snap.rows) + 2
+    last = first + len(new) - 1
+    try:
+        if last > ws.row_count:
+            _api(ws.add_rows, last - ws.row_count, idempotent=False)
+        _api(ws.batch_update, [{
+            "range": f"{rowcol_to_a1(first, 1)}:{rowcol_to_a1(last, len(headers))}",
+            "values": new,
+        }])
+    except APIError as e:
+        invalidate_cache(name)
+        raise RuntimeError(
+            f"Erro ao acrescentar linhas na aba '{name}'. "
+            "Verifique permissões e se não há proteção de intervalo bloqueando escrita."
+        ) from e
+    rows = snap.rows + new
+    _snapshot_store().put(name, snap._replace(rows=rows, df=_values_to_df(name, headers, rows)))
+    _snapshot_store().drop_keys(name)  # a revisão antiga segue valendo, mas a aba cresceu
+
+class _WriteQueue:
+    """
+    Fila write-behind compartilhada entre sessões. Guarda só a versão mais recente de cada
+    aba e, após WRITE_DEBOUNCE_SEC sem novas escritas (ou WRITE_MAX_DELAY_SEC no máximo),
+    grava o lote com write_df numa thread própria.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending: Dict[str, tuple] = {}   # nome -> (headers, df, enfileirado_em, tentativas)
+        self.inflight: Dict[str, tuple] = {}  # nome -> (headers, df) sendo gravado agora
+        self.status: Dict[str, Dict] = {}
+        self.first_at: Optional[float] = None
+        self.last_at = 0.0
+        self.thread = threading.Thread(target=self._run, name="sheets-write-behind", daemon=True)
+        self.thread.start()
+
+    def put(self, name: str, headers: List[str], df: pd.DataFrame, attempts: int = 0, delay: float = 0.0):
+        now = time.time()
+        with self.cond:
+            self.pending[name] = (list(headers), df.copy(), now, attempts)
+            self.first_at = self.first_at or now
+            self.last_at = max(self.last_at, now + delay)
+            if not attempts:
+                self.status[name] = {"state": "pendente", "error": None, "at": now}
+            self.cond.notify_all()
+
+    def peek(self, name: str, headers: List[str]) -> Optional[pd.DataFrame]:
+        """Versão ainda não gravada da aba (para as leituras enxergarem a própria escrita)."""
+        with self.cond:
+            item = self.pending.get(name) or self.inflight.get(name)
+        if item is None or item[0] != list(headers):
+            return None
+        return item[1]
+
+    def has_pending(self, name: str) -> bool:
+        with self.cond:
+            return name in self.pending or name in self.inflight
+
+    def wait_idle(self, timeout: Optional[float] = None, name: Optional[str] = None) -> bool:
+        """Espera a fila (ou só a aba `name`) esvaziar."""
+        if name is None:
+            idle = lambda: not self.pending and not self.inflight
+        else:
+            idle = lambda: name not in self.pending and name not in self.inflight
+        with self.cond:
+            return self.cond.wait_for(idle, timeout)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                due = min(self.last_at + WRITE_DEBOUNCE_SEC, self.first_at + WRITE_MAX_DELAY_SEC)
+                wait = due - time.time()
+                if wait > 0:
+                    self.cond.wait(wait)
+                    continue
+                batch, self.pending = self.pending, {}
+                self.first_at = None
+                self.inflight = {name: item[:2] for name, item in batch.items()}
+                for name in batch:
+                    self.status[name] = {"state": "gravando", "error": None, "at": time.time()}
+
+            for name, (headers, df, _, attempts) in batch.items():
+                try:
+                    write_df(name, headers, df)
+                    status = {"state": "salvo", "error": None, "at": time.time()}
+                except Exception as e:
+                    status = {"state": "erro", "error": str(e), "at": time.time()}
+                    with self.cond:
+                        retry = name not in self.pending and attempts + 1 < WRITE_MAX_ATTEMPTS
+                    if retry:
+                        self.put(name, headers, df, attempts=attempts + 1, delay=WRITE_RETRY_SEC)
+                with self.cond:
+                    if name not in self.pending or status["state"] == "erro":
+                        self.status[name] = status
+                    self.inflight.pop(name, None)
+                    self.cond.notify_all()
+
+@st.cache_resource(show_spinner=False)
+def _write_queue() -> _WriteQueue:
+    return _WriteQueue()
+
+def enqueue_write(name: str, headers: List[str], df: pd.DataFrame):
+    """Agenda a gravação da aba em segundo plano (escritas seguidas da mesma aba são fundidas)."""
+    _write_queue().put(name, headers, df)
+
+def write_status(name: str) -> Optional[Dict]:
+    """Situação da última escrita enfileirada da aba: state (pendente/gravando/salvo/erro), error, at."""
+    with _write_queue().cond:
+        status = _write_queue().status.get(name)
+    return dict(status) if status else None
+
+def has_pending_write(name: str) -> bool:
+    """A aba tem gravação na fila (as leituras dela vêm da fila, não do backend)?"""
+    return _write_queue().has_pending(name)
+
+def flush_writes(timeout: Optional[float] = None, name: Optional[str] = None) -> bool:
+    """Aguarda a fila (ou só as gravações da aba `name`) esvaziar; False se o tempo acabar antes."""
+    return _write_queue().wait_idle(timeout, name)
+
+@metrics.instrument("sheets.append_rows")
+def append_rows(name: str, headers: List[str], df: pd.DataFrame):
+    """Acrescenta linhas no fim da aba sem regravar o resto (importação em lotes)."""
+    get_backend().append_rows(name, headers, df)
+
+def _next_value(s: pd.Series, start: int = 1) -> int:
+    """Maior valor numérico da série + 1 (ou `start`, se não houver nenhum)."""
+    num = pd.to_numeric(s.astype(object), errors="coerce").dropna()
+    return int(num.max()) + 1 if len(num) else start
+
+@metrics.instrument("sheets.write_rows")
+def write_rows(name: str, headers: List[str], page: pd.DataFrame, edited: pd.DataFrame) -> int:
+    """
+    Grava só a diferença entre uma página lida com read_rows e a versão editada: linhas
+    alteradas no lugar, novas no fim (com o próximo id/order) e removidas apagadas.
+    Antes confere pelo id se as linhas da página ainda estão onde estavam. Retorna
+    quantas linhas foram gravadas ou removidas.
+    """
+    if _write_queue().has_pending(name) and not flush_writes(WRITE_MAX_DELAY_SEC * 2, name):
+        raise RuntimeError(f"Ainda há uma gravação da aba '{name}' na fila; tente de novo em instantes.")
+    backend = get_backend()
+    old = dict(zip(page[ROW_COL].astype(int), _to_values(name, headers, page.reindex(columns=headers))))
+    rows = edited[ROW_COL] if ROW_COL in edited.columns else pd.Series(pd.NA, index=edited.index)
+    new_values = _to_values(name, headers, edited.reindex(columns=headers)) if not edited.empty else []
+    changed = [i for i, (r, v) in enumerate(zip(rows, new_values)) if pd.notna(r) and old.get(int(r)) != v]
+    added = [i for i, r in enumerate(rows) if pd.isna(r)]
+    deleted = sorted(set(old) - {int(r) for r in rows if pd.notna(r)})
+    if not changed and not added and not deleted:
+        return 0
+
+    touched = [int(rows.iloc[i]) for i in changed] + deleted
+    current = backend.read_rows(name, headers, touched) if touched else None
+    if "id" in headers and touched:
+        ids = {r: v[headers.index("id")] for r, v in old.items()}
+        now = dict(zip(current[ROW_COL].astype(int),
+                       (v[headers.index("id")] for v in _to_values(name, headers, current.reindex(columns=headers)))))
+        if any(now.get(r) != ids[r] for r in touched):
+            raise RuntimeError(
+                "As linhas desta página mudaram na planilha desde que foram abertas "
+                "(outra edição ou importação). Recarregue a página e refaça as alterações."
+            )
+    if current is not None and invalid_cells(current):
+        # linhas alteradas não podem apagar células que a leitura não converteu
+        new_by_row = {int(rows.iloc[i]): new_values[i] for i in changed}
+        handles = current[ROW_COL].astype(int).tolist()
+        lost = {col: {j: text for j, text in found.items()
+                      if handles[j] in new_by_row and new_by_row[handles[j]][headers.index(col)] == ""}
+                for col, found in invalid_cells(current).items()}
+        lost = {col: found for col, found in lost.items() if found}
+        if lost:
+            raise RuntimeError(
+                f"A aba '{name}' tem valores que não são números válidos "
+                f"({describe_invalid(lost, handles)}). "
+                "Corrija-os na planilha antes de salvar por aqui, para eles não serem apagados."
+            )
+
+    out = edited.iloc[changed + added].copy()
+    out[ROW_COL] = list(rows.iloc[changed]) + [pd.NA] * len(added)
+    fill = [h for h in ("id", "order") if h in headers]
+    if added and fill:
+        top = backend.read_index(name, headers, fill)
+        for h in fill:
+            col = out[h].astype(object)
+            missing = [i for i, r in enumerate(out[ROW_COL]) if pd.isna(r) and pd.isna(col.iloc[i])]
+            start = _next_value(top[h])
+            for n, i in enumerate(missing):
+                col.iloc[i] = start + n
+            out[h] = col
+    backend.write_rows(name, headers, out, deleted)
+    return len(changed) + len(added) + len(deleted)
 
 def upsert_row(name: str, headers: List[str], row: Dict, key_col: str = "id"):
-    df = read_df(name, headers)
-    if key_col in df.columns and str(row.get(key_col, "")).strip() != "":
-        key = str(row[key_col])
-        if key in df[key_col].astype(str).values:
+    """Atualiza a linha com a chave `key_col` (ou insere no fim, gerando o próximo id)."""
+    if _write_queue().has_pending(name):
+        # já há uma versão na fila: funde com ela em vez de gravar por cima
+        df = _upsert_df(read_df(name, headers), headers, row, key_col)
+        enqueue_write(name, headers, df)
+        return row
+    return get_backend().upsert_row(name, headers, row, key_col)
+
+def delete_row(name: str, headers: List[str], key, key_col: str = "id") -> bool:
+    """Remove a linha com a chave; retorna False se ela não existir."""
+    if _write_queue().has_pending(name):
+        df = read_df(name, headers)
+        keep = df[key_col].map(_key_text) != _key_text(key)
+        if keep.all():
+            return False
+        enqueue_write(name, headers, df[keep].reset_index(drop=True))
+        return True
+    return get_backend().delete_row(name, headers, key, key_col)
+
+def _upsert_df(df: pd.DataFrame, headers: List[str], row: Dict, key_col: str) -> pd.DataFrame:
+    """Aplica o upsert sobre o DataFrame da aba (a ordem física das linhas é mantida)."""
+    df = df.astype(object)
+    if key_col in df.columns and _key_text(row.get(key_col)) != "":
+        match = df[key_col].map(_key_text) == _key_text(row[key_col])
+        if match.any():
             # update
             for k, v in row.items():
                 if k in df.columns:
-                    df.loc[df[key_col].astype(str) == key, k] = v
+                    df.loc[match, k] = v
         else:
             # insert
             df.loc[len(df)] = [row.get(h, None) for h in headers]
@@ -179,9 +1246,41 @@ def upsert_row(name: str, headers: List[str], row: Dict, key_col: str = "id"):
             next_id = 1 if df.empty else int(pd.to_numeric(df["id"], errors="coerce").fillna(0).max()) + 1
             row["id"] = next_id
         df.loc[len(df)] = [row.get(h, None) for h in headers]
+    return df
 
-    if "order" in df.columns:
-        df["order"] = pd.to_numeric(df["order"], errors="coerce").fillna(0).astype(int)
-        df = df.sort_values("order")
-    write_df(name, headers, df)
-    return row
+@storage_backend("sheets")
+class SheetsBackend(StorageBackend):
+    """Google Sheets: snapshots por revisão, governador de cota e escrita por diff."""
+
+    def read_many(self, tabs: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+        snaps = _snapshots(tabs)
+        return {name: snaps[name].df for name in tabs}
+
+    def write_df(self, name: str, headers: List[str], df: pd.DataFrame):
+        with lane("write"):
+            _write_df(name, headers, df)
+
+    def append_rows(self, name: str, headers: List[str], df: pd.DataFrame):
+        with lane("write"):
+            _append_rows(name, headers, df)
+
+    def read_index(self, name: str, headers: List[str], columns: List[str]) -> pd.DataFrame:
+        return _read_index(name, headers, columns)
+
+    def read_rows(self, name: str, headers: List[str], rows: List[int]) -> pd.DataFrame:
+        return _read_rows(name, headers, rows)
+
+    def write_rows(self, name: str, headers: List[str], df: pd.DataFrame, deleted: List[int]):
+        with lane("write"):
+            _write_rows(name, headers, df, deleted)
+
+    def upsert_row(self, name: str, headers: List[str], row: Dict, key_col: str = "id") -> Dict:
+        with lane("write"):
+            return _upsert_row(name, headers, row, key_col)
+
+    def delete_row(self, name: str, headers: List[str], key, key_col: str = "id") -> bool:
+        with lane("write"):
+            return _delete_row(name, headers, key, key_col)
+
+    def revision(self) -> Optional[str]:
+        return current_revision()
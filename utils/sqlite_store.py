@@ -0,0 +1,258 @@
+import pandas as pd
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils import metrics
+from utils.schemas import SCHEMAS
+from utils.sheets import _to_values, _values_to_df
+from utils.storage import ROW_COL, StorageBackend, storage_backend
+
+# Backend SQLite local: uma tabela por aba, com as mesmas colunas (texto como na
+# planilha, afinidade numérica onde o schema declara número) e a ordem da planilha em
+# _row. Índices em is_active e order atendem a leitura do display (read_active).
+
+SQLITE_DEFAULT_PATH = "tvcorp.db"
+SQLITE_TIMEOUT = 10  # espera por lock de outro processo (admin e display no mesmo arquivo)
+SQLITE_MAX_PARAMS = 900  # parâmetros por consulta (o limite antigo do SQLite é 999)
+
+NUMERIC_AFFINITY = {"int": "INTEGER", "int16": "INTEGER", "float": "REAL"}
+
+def _q(ident: str) -> str:
+    return '"' + str(ident).replace('"', '""') + '"'
+
+def _affinity(name: str, column: str) -> str:
+    schema = SCHEMAS.get(name)
+    kinds = {c.name: c.kind for c in schema.columns} if schema is not None else {}
+    return NUMERIC_AFFINITY.get(kinds.get(column, ""), "TEXT")
+
+def _text(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+@storage_backend("sqlite")
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path: str = SQLITE_DEFAULT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=SQLITE_TIMEOUT, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # leitores não esperam o admin gravar
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.tables: Dict[str, List[str]] = {}        # colunas já garantidas neste processo
+        self.cache: Dict[str, Tuple[str, List[str], pd.DataFrame]] = {}
+        self.writes = 0
+
+    # === Esquema ===
+    def _ensure_table(self, name: str, headers: List[str]):
+        if self.tables.get(name) == list(headers):
+            return
+        cols = ", ".join(f"{_q(h)} {_affinity(name, h)}" for h in headers)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(name)} (_row INTEGER PRIMARY KEY, {cols})")
+        existing = {r[1] for r in self.conn.execute(f"PRAGMA table_info({_q(name)})")}
+        for h in headers:
+            if h not in existing:
+                self.conn.execute(f"ALTER TABLE {_q(name)} ADD COLUMN {_q(h)} {_affinity(name, h)}")
+        for cols in (("is_active", "order"), ("order",), ("id",)):
+            if all(c in headers for c in cols):
+                ix = _q(f"ix_{name}_{'_'.join(cols)}")
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {ix} ON {_q(name)} ({', '.join(_q(c) for c in cols)})"
+                )
+        self.tables[name] = list(headers)
+
+    def revision(self) -> Optional[str]:
+        # data_version muda quando outra conexão grava; as gravações desta contam em writes
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            return f"{version}.{self.writes}"
+
+    # === Leitura ===
+    def _select(self, name: str, headers: List[str], where: str = "", order: str = "_row") -> List[List[str]]:
+        cols = ", ".join(_q(h) for h in headers)
+        cur = self.conn.execute(f"SELECT {cols} FROM {_q(name)} {where} ORDER BY {order}")
+        return [[_text(v) for v in r] for r in cur]
+
+    def read_many(self, tabs: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+        out = {}
+        with metrics.timed("sqlite.read"), self.lock:
+            revision = self.revision()
+            for name, headers in tabs.items():
+                cached = self.cache.get(name)
+                metrics.cache_hit("sqlite.snapshot", bool(cached and cached[:2] == (revision, headers)))
+                if cached and cached[:2] == (revision, headers):
+                    out[name] = cached[2]
+                    continue
+                self._ensure_table(name, headers)
+                df = _values_to_df(name, headers, self._select(name, headers))
+                self.cache[name] = (revision, list(headers), df)
+                out[name] = df
+        return out
+
+    def read_active(self, tabs: Dict[str, List[str]],
+                    full: Optional[Dict[str, List[str]]] = None) -> Dict[str, pd.DataFrame]:
+        full = full or {}
+        plain = {n: h for n, h in tabs.items() if "is_active" not in h or "order" not in h}
+        out = super().read_active(plain, full) if plain or full else {}
+        with metrics.timed("sqlite.read_active"), self.lock:
+            for name, headers in tabs.items():
+                if name in plain:
+                    continue
+                self._ensure_table(name, headers)
+                rows = self._select(name, headers, where=f"WHERE {_q('is_active')} = 'TRUE'",
+                                    order=f"{_q('order')}, _row")
+                out[name] = _values_to_df(name, headers, rows)
+        return {name: out[name] for name in [*full, *tabs]}
+
+    def read_index(self, name: str, headers: List[str], columns: List[str]) -> pd.DataFrame:
+        with metrics.timed("sqlite.read_index"), self.lock:
+            self._ensure_table(name, headers)
+            cur = self.conn.execute(
+                f"SELECT {', '.join(_q(c) for c in columns)}, _row FROM {_q(name)} ORDER BY _row")
+            rows = [[_text(v) for v in r] for r in cur]
+        df = _values_to_df(name, headers, [[dict(zip(columns, r)).get(h, "") for h in headers] for r in rows])
+        return df[list(columns)].assign(**{ROW_COL: [int(r[-1]) for r in rows]})
+
+    def read_rows(self, name: str, headers: List[str], rows: List[int]) -> pd.DataFrame:
+        wanted = [int(r) for r in rows]
+        with metrics.timed("sqlite.read_rows"), self.lock:
+            self._ensure_table(name, headers)
+            found = {}
+            for i in range(0, len(wanted), SQLITE_MAX_PARAMS):
+                part = wanted[i:i + SQLITE_MAX_PARAMS]
+                cur = self.conn.execute(
+                    f"SELECT _row, {', '.join(_q(h) for h in headers)} FROM {_q(name)} "
+                    f"WHERE _row IN ({', '.join('?' for _ in part)})", part)
+                found.update((r[0], [_text(v) for v in r[1:]]) for r in cur)
+        keep = [r for r in wanted if r in found]
+        df = _values_to_df(name, headers, [found[r] for r in keep])
+        df[ROW_COL] = keep
+        return df
+
+    # === Escrita ===
+    def _commit(self, name: str):
+        self.writes += 1
+        self.cache.pop(name, None)
+
+    def write_df(self, name: str, headers: List[str], df: pd.DataFrame):
+        rows = _to_values(name, headers, df) if not df.empty else []
+        cols = ", ".join(_q(h) for h in headers)
+        marks = ", ".join("?" for _ in range(len(headers) + 1))
+        with metrics.timed("sqlite.write"), self.lock:
+            self._ensure_table(name, headers)
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.execute(f"DELETE FROM {_q(name)}")
+                self.conn.executemany(f"INSERT INTO {_q(name)} (_row, {cols}) VALUES ({marks})",
+                                      ([i + 1] + r for i, r in enumerate(rows)))
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise RuntimeError(f"Erro ao gravar a tabela '{name}' no SQLite ({self.path}): {e}") from e
+            finally:
+                self._commit(name)
+
+    def append_rows(self, name: str, headers: List[str], df: pd.DataFrame):
+        rows = _to_values(name, headers, df) if not df.empty else []
+        cols = ", ".join(_q(h) for h in headers)
+        marks = ", ".join("?" for _ in range(len(headers) + 1))
+        with metrics.timed("sqlite.append"), self.lock:
+            self._ensure_table(name, headers)
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                last = self.conn.execute(f"SELECT COALESCE(MAX(_row), 0) FROM {_q(name)}").fetchone()[0]
+                self.conn.executemany(f"INSERT INTO {_q(name)} (_row, {cols}) VALUES ({marks})",
+                                      ([last + i + 1] + r for i, r in enumerate(rows)))
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise RuntimeError(f"Erro ao gravar a tabela '{name}' no SQLite ({self.path}): {e}") from e
+            finally:
+                self._commit(name)
+
+    def write_rows(self, name: str, headers: List[str], df: pd.DataFrame, deleted: List[int]):
+        rows = df[ROW_COL] if ROW_COL in df.columns else pd.Series(pd.NA, index=df.index)
+        values = _to_values(name, headers, df.reindex(columns=headers)) if not df.empty else []
+        sets = ", ".join(f"{_q(h)} = ?" for h in headers)
+        cols = ", ".join(_q(h) for h in headers)
+        marks = ", ".join("?" for _ in range(len(headers) + 1))
+        with metrics.timed("sqlite.write_rows"), self.lock:
+            self._ensure_table(name, headers)
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany(f"UPDATE {_q(name)} SET {sets} WHERE _row = ?",
+                                      (v + [int(r)] for r, v in zip(rows, values) if pd.notna(r)))
+                last = self.conn.execute(f"SELECT COALESCE(MAX(_row), 0) FROM {_q(name)}").fetchone()[0]
+                new = [v for r, v in zip(rows, values) if pd.isna(r)]
+                self.conn.executemany(f"INSERT INTO {_q(name)} (_row, {cols}) VALUES ({marks})",
+                                      ([last + i + 1] + v for i, v in enumerate(new)))
+                self.conn.executemany(f"DELETE FROM {_q(name)} WHERE _row = ?", ((int(r),) for r in deleted))
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise RuntimeError(f"Erro ao gravar a tabela '{name}' no SQLite ({self.path}): {e}") from e
+            finally:
+                self._commit(name)
+
+    def upsert_row(self, name: str, headers: List[str], row: Dict, key_col: str = "id") -> Dict:
+        """Atualiza só as colunas informadas da linha com a chave, ou insere uma linha no fim."""
+        with metrics.timed("sqlite.upsert"), self.lock:
+            self._ensure_table(name, headers)
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._upsert(name, headers, row, key_col)
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise RuntimeError(f"Erro ao gravar a tabela '{name}' no SQLite ({self.path}): {e}") from e
+            finally:
+                self._commit(name)
+        return row
+
+    def delete_row(self, name: str, headers: List[str], key, key_col: str = "id") -> bool:
+        with metrics.timed("sqlite.delete"), self.lock:
+            self._ensure_table(name, headers)
+            try:
+                cur = self.conn.execute(
+                    f"DELETE FROM {_q(name)} WHERE _row = "
+                    f"(SELECT _row FROM {_q(name)} WHERE {_q(key_col)} = ? ORDER BY _row LIMIT 1)",
+                    (_text(key).strip(),))
+            except sqlite3.Error as e:
+                raise RuntimeError(f"Erro ao gravar a tabela '{name}' no SQLite ({self.path}): {e}") from e
+            finally:
+                self._commit(name)
+        return cur.rowcount > 0
+
+    def _upsert(self, name: str, headers: List[str], row: Dict, key_col: str):
+        table = _q(name)
+        key = str(row.get(key_col, "")).strip() if key_col in headers else ""
+        if not key and "id" in headers:
+            # gera próximo id
+            top = self.conn.execute(f"SELECT MAX(CAST({_q('id')} AS INTEGER)) FROM {table}").fetchone()[0]
+            row["id"] = (top or 0) + 1
+        # valores no formato da planilha (mesma serialização do write_df)
+        values = dict(zip(headers, _to_values(name, headers, pd.DataFrame([{h: row.get(h) for h in headers}]))[0]))
+        found = self.conn.execute(f"SELECT _row FROM {table} WHERE {_q(key_col)} = ? LIMIT 1",
+                                  (key,)).fetchone() if key else None
+        if found:
+            cols = [h for h in headers if h in row]
+            if cols:
+                sets = ", ".join(f"{_q(h)} = ?" for h in cols)
+                self.conn.execute(f"UPDATE {table} SET {sets} WHERE _row = ?",
+                                  [values[h] for h in cols] + [found[0]])
+            return
+        last = self.conn.execute(f"SELECT COALESCE(MAX(_row), 0) FROM {table}").fetchone()[0]
+        cols = ", ".join(_q(h) for h in headers)
+        marks = ", ".join("?" for _ in range(len(headers) + 1))
+        self.conn.execute(f"INSERT INTO {table} (_row, {cols}) VALUES ({marks})",
+                          [last + 1] + [values[h] for h in headers])
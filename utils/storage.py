@@ -0,0 +1,123 @@
+import streamlit as st
+import pandas as pd
+from typing import Dict, List, Optional, Type
+
+# Backends de armazenamento por trás de read_df/write_df/upsert_row/delete_row (utils.sheets).
+# O backend vem dos Secrets; sem configuração, segue no Google Sheets:
+#   [storage]
+#   backend = "sqlite"        # "sheets" (padrão) | "sqlite"
+#   path = "data/tvcorp.db"   # só para o sqlite
+
+STORAGE_BACKENDS: Dict[str, Type["StorageBackend"]] = {}
+DEFAULT_BACKEND = "sheets"
+
+def storage_backend(name: str):
+    """Registra uma classe de backend em STORAGE_BACKENDS."""
+    def decorator(cls):
+        cls.name = name
+        STORAGE_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+ROW_COL = "_row"  # identificador da linha no backend (linha da planilha, _row do SQLite)
+
+def active_rows(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df["is_active"]].sort_values("order", kind="stable")
+
+def index_of(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Colunas de índice de uma aba já lida; _row é a posição como linha da planilha."""
+    return df[list(columns)].assign(**{ROW_COL: range(2, len(df) + 2)})
+
+def rows_of(df: pd.DataFrame, rows: List[int]) -> pd.DataFrame:
+    """Linhas pedidas (_row como em index_of) de uma aba já lida, na ordem pedida."""
+    pos = [int(r) - 2 for r in rows if 2 <= int(r) < len(df) + 2]
+    out = df.iloc[pos].assign(**{ROW_COL: [p + 2 for p in pos]}).reset_index(drop=True)
+    # células não convertidas (Schema.coerce) passam a usar as posições do recorte
+    invalid = df.attrs.get("invalid") or {}
+    moved = {col: {j: found[p] for j, p in enumerate(pos) if p in found} for col, found in invalid.items()}
+    out.attrs["invalid"] = {col: found for col, found in moved.items() if found}
+    return out
+
+class StorageBackend:
+    """Interface comum: abas como DataFrames tipados pelo registro de schemas."""
+
+    name = "base"
+
+    def read_many(self, tabs: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+        """{aba: headers} -> {aba: DataFrame}; os DataFrames podem ser compartilhados (não altere)."""
+        raise NotImplementedError
+
+    def read_active(self, tabs: Dict[str, List[str]],
+                    full: Optional[Dict[str, List[str]]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        {aba: headers} -> linhas ativas de cada aba na ordem de exibição (coluna order),
+        mais as abas de `full` inteiras, tudo na mesma leitura.
+        """
+        full = full or {}
+        data = self.read_many({**full, **tabs})
+        return {name: (df if name in full else active_rows(df)) for name, df in data.items()}
+
+    def read_index(self, name: str, headers: List[str], columns: List[str]) -> pd.DataFrame:
+        """Só as colunas `columns` de todas as linhas + _row, para filtrar e paginar."""
+        return index_of(self.read_many({name: headers})[name], columns)
+
+    def read_rows(self, name: str, headers: List[str], rows: List[int]) -> pd.DataFrame:
+        """Só as linhas com os _row dados (do read_index), com a coluna _row."""
+        return rows_of(self.read_many({name: headers})[name], rows)
+
+    def write_df(self, name: str, headers: List[str], df: pd.DataFrame):
+        raise NotImplementedError
+
+    def write_rows(self, name: str, headers: List[str], df: pd.DataFrame, deleted: List[int]):
+        """
+        Grava só as linhas dadas: com _row substitui a linha, sem _row acrescenta no fim; as
+        linhas `deleted` são removidas. Padrão: aplica sobre a aba lida e regrava tudo.
+        """
+        full = self.read_many({name: headers})[name].astype(object)
+        rows = df[ROW_COL] if ROW_COL in df.columns else pd.Series(pd.NA, index=df.index)
+        for r, (_, row) in zip(rows, df.iterrows()):
+            if pd.notna(r) and 2 <= int(r) < len(full) + 2:
+                full.iloc[int(r) - 2] = [row.get(h) for h in headers]
+        full = full.drop(index=[int(r) - 2 for r in deleted if 2 <= int(r) < len(full) + 2])
+        added = df[rows.isna()].reindex(columns=headers)
+        self.write_df(name, headers, pd.concat([full, added], ignore_index=True))
+
+    def append_rows(self, name: str, headers: List[str], df: pd.DataFrame):
+        """Acrescenta linhas no fim da aba (padrão: regrava a aba inteira)."""
+        old = self.read_many({name: headers})[name]
+        self.write_df(name, headers, pd.concat([old, df], ignore_index=True))
+
+    def upsert_row(self, name: str, headers: List[str], row: Dict, key_col: str = "id") -> Dict:
+        raise NotImplementedError
+
+    def delete_row(self, name: str, headers: List[str], key, key_col: str = "id") -> bool:
+        """Remove a linha com a chave (padrão: regrava a aba sem ela); False se não existir."""
+        df = self.read_many({name: headers})[name]
+        keep = df[key_col].astype(str) != str(key)
+        if keep.all():
+            return False
+        self.write_df(name, headers, df[keep].reset_index(drop=True))
+        return True
+
+    def revision(self) -> Optional[str]:
+        """Marca que muda quando os dados mudam (None = desconhecida)."""
+        return None
+
+def _storage_config() -> Dict:
+    try:
+        return dict(st.secrets.get("storage", {}))
+    except Exception:
+        return {}  # sem secrets.toml: backend padrão
+
+@st.cache_resource(show_spinner=False)
+def get_backend() -> StorageBackend:
+    """Backend configurado em [storage] nos Secrets (um por processo)."""
+    from utils import sheets, sqlite_store  # noqa: F401  (registram os backends)
+    config = _storage_config()
+    name = str(config.pop("backend", DEFAULT_BACKEND)).strip().lower()
+    if name not in STORAGE_BACKENDS:
+        raise RuntimeError(
+            f"Backend de armazenamento desconhecido: '{name}'. "
+            f"Use um de: {', '.join(sorted(STORAGE_BACKENDS))}."
+        )
+    return STORAGE_BACKENDS[name](**config)